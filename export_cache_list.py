@@ -1,74 +1,123 @@
 """
 Export cached articles to a readable text file.
 Run this script to see all articles in the cache.
+Pass --gzip to write a compressed .txt.gz instead.
 """
 
+import gzip
 import json
 import os
+import sys
+from collections import Counter
 from datetime import datetime
 
+# Optional streaming JSON parser - keeps memory flat on large caches
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Optional fast JSON parser used when streaming isn't available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 CONTENT_CACHE_FILE = 'via_website_content.json'
-OUTPUT_FILE = f'cached_articles_list_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt'
 
-def export_cache_to_file():
-    """Export the cached articles to a readable text file."""
+# Separator lines, built once rather than per article
+SEP80 = "=" * 80 + "\n"
+DASH80 = "-" * 80 + "\n"
+
+def iter_cached_articles():
+    """Yield articles from the cache file one at a time."""
+    with open(CONTENT_CACHE_FILE, 'rb') as f:
+        if IJSON_AVAILABLE:
+            yield from ijson.items(f, 'item')
+        elif ORJSON_AVAILABLE:
+            yield from orjson.loads(f.read())
+        else:
+            yield from json.load(f)
+
+def export_cache_to_file(compress: bool = False):
+    """Export the cached articles to a readable text file (gzip-compressed if compress=True)."""
     if not os.path.exists(CONTENT_CACHE_FILE):
         print(f"❌ Cache file not found: {CONTENT_CACHE_FILE}")
         print("   The cache will be created when you first run the Streamlit app.")
         return
     
+    # Timestamp once per export (not at import) so repeat runs get fresh names
+    now = datetime.now()
+    output_file = f'cached_articles_list_{now.strftime("%Y%m%d_%H%M%S")}.txt'
+    if compress:
+        output_file += '.gz'
+    tmp_file = output_file + '.tmp'
+    
     try:
-        with open(CONTENT_CACHE_FILE, 'r') as f:
-            articles = json.load(f)
+        # First pass: count articles by type so the header can be written
+        # without holding the whole cache in memory
+        type_counts = Counter(article.get('type', 'unknown') for article in iter_cached_articles())
+        total_articles = sum(type_counts.values())
         
-        print(f"📚 Found {len(articles)} articles in cache")
-        print(f"📝 Exporting to {OUTPUT_FILE}...")
+        print(f"📚 Found {total_articles} articles in cache")
+        print(f"📝 Exporting to {output_file}...")
         
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("VIA WEBSITE CONTENT CACHE - ARTICLE LIST\n")
-            f.write("=" * 80 + "\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Total Articles: {len(articles)}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            # Group by type
-            by_type = {}
-            for article in articles:
-                article_type = article.get('type', 'unknown')
-                if article_type not in by_type:
-                    by_type[article_type] = []
-                by_type[article_type].append(article)
+        # Write to a temp file and rename at the end so a failed export never
+        # leaves a truncated list behind
+        if compress:
+            # Level 1: the export is mostly repeated labels and separators, so
+            # even the fastest level shrinks it several times over
+            out = gzip.open(tmp_file, 'wt', encoding='utf-8', compresslevel=1)
+        else:
+            out = open(tmp_file, 'w', encoding='utf-8', buffering=1 << 20)
+        with out as f:
+            f.write(
+                SEP80
+                + "VIA WEBSITE CONTENT CACHE - ARTICLE LIST\n"
+                + SEP80
+                + f"Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                + f"Total Articles: {total_articles}\n"
+                + SEP80 + "\n"
+            )
             
-            # Write summary by type
-            f.write("SUMMARY BY TYPE\n")
-            f.write("-" * 80 + "\n")
-            for article_type, type_articles in sorted(by_type.items()):
-                f.write(f"{article_type.upper()}: {len(type_articles)} articles\n")
-            f.write("\n" + "=" * 80 + "\n\n")
+            # Write summary by type in a single write
+            summary_body = "".join(
+                f"{article_type.upper()}: {count} articles\n"
+                for article_type, count in sorted(type_counts.items())
+            )
+            f.write("SUMMARY BY TYPE\n" + DASH80 + summary_body + "\n" + SEP80 + "\n")
             
-            # Write detailed list
-            for idx, article in enumerate(articles, 1):
-                f.write(f"\n{'=' * 80}\n")
-                f.write(f"ARTICLE #{idx}\n")
-                f.write(f"{'=' * 80}\n")
-                f.write(f"Type: {article.get('type', 'N/A')}\n")
-                f.write(f"Title: {article.get('title', 'N/A')}\n")
-                f.write(f"URL: {article.get('url', 'N/A')}\n")
+            # Second pass: write detailed list - one write per article
+            for idx, article in enumerate(iter_cached_articles(), 1):
+                parts = [
+                    "\n", SEP80,
+                    f"ARTICLE #{idx}\n",
+                    SEP80,
+                    f"Type: {article.get('type', 'N/A')}\n",
+                    f"Title: {article.get('title', 'N/A')}\n",
+                    f"URL: {article.get('url', 'N/A')}\n",
+                ]
                 if article.get('description'):
-                    f.write(f"Description: {article.get('description')}\n")
+                    parts.append(f"Description: {article.get('description')}\n")
                 if article.get('states'):
-                    f.write(f"States Mentioned: {', '.join(article.get('states', []))}\n")
+                    parts.append(f"States Mentioned: {', '.join(article.get('states', []))}\n")
                 if article.get('content'):
-                    content_preview = article.get('content', '')[:300]
-                    f.write(f"Content Preview: {content_preview}...\n")
-                f.write("\n")
+                    # Older caches predate the stored preview
+                    content_preview = article.get('content_preview') or article.get('content', '')[:300]
+                    parts.append(f"Content Preview: {content_preview}...\n")
+                parts.append("\n")
+                f.write("".join(parts))
+        os.replace(tmp_file, output_file)
         
-        print(f"✅ Successfully exported to {OUTPUT_FILE}")
+        print(f"✅ Successfully exported to {output_file}")
         print(f"   You can now review the list and add more sections if needed.")
         
     except Exception as e:
         print(f"❌ Error exporting cache: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 if __name__ == "__main__":
-    export_cache_to_file()
+    export_cache_to_file(compress='--gzip' in sys.argv[1:])
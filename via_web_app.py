@@ -14,15 +14,29 @@ import os
 import re
 import numpy as np
 import random
-from typing import Dict, List, Optional
+import pickle
+import sys
+import atexit
+import csv
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import pandas as pd
-from openai import OpenAI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
 import logging
 
+# openai, pandas and bs4 are imported where they are used to keep app startup fast
+if TYPE_CHECKING:
+    import pandas as pd
+    from openai import OpenAI
+
 # Google Sheets imports
 try:
     import gspread
@@ -31,16 +45,59 @@ try:
 except ImportError:
     GSPREAD_AVAILABLE = False
 
+# lxml is a much faster BeautifulSoup backend; fall back to the stdlib parser without it
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# orjson reads and writes the content cache several times faster than the json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# tiktoken lets article text be truncated by tokens rather than characters before embedding
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 WEBSITE_URL = 'https://ridewithvia.com'
 CONTENT_CACHE_FILE = 'via_website_content.json'
+CONTENT_CACHE_PICKLE = 'via_website_content.pkl'  # Binary copy of the JSON cache for fast loads
+EMBEDDINGS_CACHE_FILE = 'via_website_embeddings.npy'  # Article embeddings, one row per article
+EMBEDDINGS_INDEX_FILE = 'via_website_embeddings.json'  # Article URL for each embedding row
+EMBEDDINGS_FORMAT_VERSION = 2  # 2: sidecar rows are L2-normalized
+PRETTY_CACHE_JSON = False  # Indent the content cache JSON (for reading it by hand while debugging)
 EMBEDDING_MODEL = 'text-embedding-3-small'  # Fast and cost-effective
+EMBEDDING_BATCH_SIZE = 256  # Article texts sent per embeddings request
+EMBEDDING_MAX_TOKENS = 256  # Article text is cut to this many tokens before embedding
+EMBEDDING_ENCODING = 'cl100k_base'  # tiktoken encoding of EMBEDDING_MODEL (named directly; older tiktoken can't map it)
+EMBEDDING_WORKERS = 4  # Embedding batches requested concurrently
+SELECTION_MODEL = 'gpt-4o-mini'  # Picking article numbers doesn't need a large model
+CHAT_MODEL = 'gpt-4o-mini'  # Answers from short excerpts; switch to 'gpt-4o' if answer quality drops
+ANSWER_CACHE_SIZE = 64  # Answered questions remembered per session
+ANSWER_CACHE_MAX_PROMPT = 300  # Longer questions are one-offs and always go to the model
 GOOGLE_SHEETS_SPREADSHEET_ID = '1Qu26woHPnzzPcKUEY-_0QkORM5AZM2PGM38qB2FWpu4'  # Default spreadsheet ID
 GOOGLE_SHEETS_SHEET_NAME = 'Q&A Log'  # Default sheet name
 QA_LOG_FILE = 'qa_log.csv'  # CSV log file for Q&A pairs
+LOG_COLS = ['timestamp', 'question', 'answer']  # Q&A log schema (CSV log, session logs, log table)
+QA_FLUSH_ROWS = 10  # Buffered Q&A rows that trigger a Google Sheets append
+QA_FLUSH_SECONDS = 5.0  # Flush on the next log once this long has passed since the last one
+SCRAPE_WORKERS = 8  # Concurrent page fetches while building the content cache
+SCRAPE_CHECKPOINT_FILE = 'via_website_scrape_progress.json'  # Partial scrape, removed once the cache is written
+SCRAPE_CHECKPOINT_EVERY = 20  # Pages scraped between checkpoint writes
+SCRAPE_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+QA_LOG_PATH = os.path.abspath(QA_LOG_FILE)  # Shown in the logs panel; resolved once at startup
 
 # State coordinates for distance calculation (approximate centers)
 STATE_COORDINATES = {
@@ -63,12 +120,75 @@ STATE_COORDINATES = {
     'WI': (44.268543, -89.616508), 'WY': (42.755966, -107.302490), 'DC': (38.907192, -77.036873)
 }
 
+# Column-oriented copy of STATE_COORDINATES for vectorized distance math
+STATE_CODES = np.array(list(STATE_COORDINATES.keys()))
+STATE_LATLON = np.array(list(STATE_COORDINATES.values()), dtype=np.float64)
+STATE_LATLON_RAD = np.radians(STATE_LATLON)
+STATE_SIN_LAT = np.sin(STATE_LATLON_RAD[:, 0])
+STATE_COS_LAT = np.cos(STATE_LATLON_RAD[:, 0])
+
+# Shared HTTP session: every scraped URL is on the same host, so keep-alive
+# connections are reused instead of a new TCP/TLS handshake per page
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.headers.update(SCRAPE_HEADERS)
+_HTTP_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=SCRAPE_WORKERS,
+    pool_maxsize=SCRAPE_WORKERS * 2,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
+
+# Precompiled patterns used while scraping and parsing LLM replies
+_RE_LOCATION_LABEL = re.compile(r'Location', re.I)
+_RE_LOCATION_CLASS = re.compile(r'location', re.I)
+_RE_LOCATION_CITY_STATE = re.compile(r'Location[:\s]+([^,\n]+),\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', re.IGNORECASE)
+_RE_LOCATION_STATE = re.compile(r'Location[:\s]+[^,]+,\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', re.IGNORECASE)
+_RE_LOCATION_PAGE = re.compile(r'Location[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', re.IGNORECASE)
+_RE_STATE_AFTER_COMMA = re.compile(r',\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)')
+_RE_NUMBERS = re.compile(r'\d+')
+# Content sections crawled during page discovery
+_RE_RELEVANT_PATH = re.compile(r'/(?:blog|resources|solutions|audience|case-studies|about)/')
+# Audience keyword filters for recommend_articles, one scan per field
+_RE_CITY_KEYWORDS = re.compile(r'microtransit|paratransit|city|municipal|urban', re.IGNORECASE)
+_RE_AGENCY_KEYWORDS = re.compile(r'paratransit|transit|agency|public transportation', re.IGNORECASE)
+_RE_PICK_GENERAL = re.compile(r'^\s*GENERAL\s*:(.*)$', re.IGNORECASE | re.MULTILINE)
+_RE_PICK_CASE = re.compile(r'^\s*CASE(?:[ _]STUDIES)?\s*:(.*)$', re.IGNORECASE | re.MULTILINE)
+
+# Full state names (lowercase) to abbreviations, read-only so callers can't mutate the shared table
+FULL_STATE_NAMES = MappingProxyType({
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
+    'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA',
+    'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS', 'missouri': 'MO',
+    'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH', 'new jersey': 'NJ',
+    'new mexico': 'NM', 'new york': 'NY', 'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
+    'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
+    'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
+    'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
+    'district of columbia': 'DC', 'washington dc': 'DC', 'dc': 'DC'
+})
+
+# Single-pass state matchers: one alternation per group instead of one search per state.
+# Names are ordered longest first so e.g. "west virginia" wins over "virginia".
+_RE_STATE_ABBR = re.compile(r'\b(' + '|'.join(map(re.escape, STATE_COORDINATES)) + r')\b', re.IGNORECASE)
+_RE_STATE_NAME = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(FULL_STATE_NAMES, key=len, reverse=True))) + r')\b',
+    re.IGNORECASE
+)
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def get_openai_client() -> OpenAI:
-    """Initialize OpenAI client using Streamlit secrets."""
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> "OpenAI":
+    """Initialize OpenAI client using Streamlit secrets.
+    
+    The client (and its connection pool) is built once per process and shared across
+    reruns and sessions; a missing key stops the run before anything is cached, so
+    fixing the secrets takes effect on the next rerun.
+    """
+    from openai import OpenAI
     try:
         # Try Streamlit secrets first (for cloud deployment)
         api_key = st.secrets.get("openai", {}).get("api_key") or st.secrets.get("OPENAI_API_KEY")
@@ -93,17 +213,368 @@ def get_openai_client() -> OpenAI:
     
     return OpenAI(api_key=api_key)
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two coordinates in miles using Haversine formula."""
-    from math import radians, sin, cos, sqrt, atan2
+def haversine_to_all(lat: float, lon: float) -> np.ndarray:
+    """Distance in miles from a coordinate to every state center (ordered like STATE_CODES)."""
     R = 3959  # Earth radius in miles
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    lat_q, lon_q = np.radians(lat), np.radians(lon)
+    # Haversine, with sin²(Δφ/2) + cos(φ1)cos(φ2)sin²(Δλ/2) rewritten as
+    # (1 - sin(φ1)sin(φ2) - cos(φ1)cos(φ2)cos(Δλ)) / 2 so the state-side terms
+    # come from the precomputed arrays
+    cos_dlon = np.cos(STATE_LATLON_RAD[:, 1] - lon_q)
+    a = (1 - np.sin(lat_q) * STATE_SIN_LAT - np.cos(lat_q) * STATE_COS_LAT * cos_dlon) / 2
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
     return R * c
 
+def find_state_mentions(text: str) -> List[str]:
+    """Return state codes mentioned in text, by abbreviation or full name (word-bounded)."""
+    states = {m.upper() for m in _RE_STATE_ABBR.findall(text)}
+    states.update(FULL_STATE_NAMES[m.lower()] for m in _RE_STATE_NAME.findall(text))
+    return list(states)
+
+def unit_vector(vector) -> np.ndarray:
+    """Return the vector as float32 scaled to length 1 (all-zero vectors stay zero)."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+def has_embedding(article: Dict) -> bool:
+    """True if the article carries an embedding (a list from old caches or a NumPy row)."""
+    embedding = article.get('embedding')
+    return embedding is not None and len(embedding) > 0
+
+# Fields recomputed from the scraped ones whenever articles are loaded or scraped; not persisted
+_DERIVED_FIELDS = ('is_case_study', 'context_snippet', 'desc_short')
+
+def _add_derived_fields(articles: List[Dict]) -> None:
+    """Precompute per-article values that queries would otherwise re-derive every time."""
+    for article in articles:
+        article['is_case_study'] = ('case-study' in article.get('type', '').lower() or
+                                    'case study' in article.get('title', '').lower() or
+                                    '/case-studies/' in article.get('url', '').lower())
+        # Excerpt sent to the LLM as answer context
+        article['context_snippet'] = (article.get('content') or article.get('description') or '')[:500]
+        # Caption shown on article cards
+        article['desc_short'] = (article.get('description') or '')[:150] + "..."
+
+def _load_article_metadata() -> List[Dict]:
+    """Load cached articles, using the pickle sidecar when it is newer than the JSON cache."""
+    try:
+        if os.path.getmtime(CONTENT_CACHE_PICKLE) >= os.path.getmtime(CONTENT_CACHE_FILE):
+            with open(CONTENT_CACHE_PICKLE, 'rb') as f:
+                return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    
+    with open(CONTENT_CACHE_FILE, 'rb') as f:
+        articles = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
+    # Types and states repeat across hundreds of articles - share one string each.
+    # The pickle sidecar keeps the sharing since pickle memoizes identical objects.
+    for article in articles:
+        if article.get('type'):
+            article['type'] = sys.intern(article['type'])
+        if article.get('states'):
+            article['states'] = [sys.intern(state) for state in article['states']]
+    try:
+        with open(CONTENT_CACHE_PICKLE, 'wb') as f:
+            pickle.dump(articles, f, protocol=5)
+    except OSError:
+        pass  # Sidecar is only an optimization
+    return articles
+
+def load_content_cache() -> List[Dict]:
+    """Load cached articles and attach their embeddings from the .npy sidecar."""
+    articles = _load_article_metadata()
+    _add_derived_fields(articles)
+    # Embeddings left inline by caches that predate the sidecar are stored unnormalized
+    has_inline = False
+    needs_migration = False
+    for article in articles:
+        if has_embedding(article):
+            article['embedding'] = unit_vector(article['embedding'])
+            has_inline = True
+    
+    try:
+        # Memory-mapped: rows are paged in when a search first touches them
+        matrix = np.load(EMBEDDINGS_CACHE_FILE, mmap_mode='r')
+        with open(EMBEDDINGS_INDEX_FILE, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None  # No embeddings saved yet
+    
+    if index is not None:
+        # Version 1 indexes were a bare URL list over unnormalized rows
+        if isinstance(index, list):
+            row_urls = index
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            needs_migration = True
+        else:
+            row_urls = index.get('urls', [])
+        
+        rows = {url: i for i, url in enumerate(row_urls) if i < len(matrix)}
+        for article in articles:
+            row = rows.get(article.get('url'))
+            if row is not None:
+                article['embedding'] = matrix[row]
+    
+    # Rewrite old-format embeddings once so later loads can use the files as-is
+    try:
+        if has_inline:
+            # Also strips the inline embeddings from the JSON and pickle (and writes the sidecar)
+            save_content_cache(articles)
+        elif needs_migration:
+            save_embeddings_cache(articles)
+    except OSError:
+        pass
+    return articles
+
+def save_embeddings_cache(articles: List[Dict]) -> None:
+    """Write article embeddings as one float32 matrix of unit rows plus a row -> URL index."""
+    embedded = [a for a in articles if has_embedding(a)]
+    if not embedded:
+        return
+    matrix = np.asarray([a['embedding'] for a in embedded], dtype=np.float32)
+    # Write to temp files and swap them in: loaded embeddings are memory-mapped views of the
+    # current file, and truncating it in place would invalidate them
+    with open(EMBEDDINGS_CACHE_FILE + '.tmp', 'wb') as f:
+        np.save(f, matrix)
+    with open(EMBEDDINGS_INDEX_FILE + '.tmp', 'w') as f:
+        json.dump({'version': EMBEDDINGS_FORMAT_VERSION, 'urls': [a['url'] for a in embedded]}, f)
+    os.replace(EMBEDDINGS_CACHE_FILE + '.tmp', EMBEDDINGS_CACHE_FILE)
+    os.replace(EMBEDDINGS_INDEX_FILE + '.tmp', EMBEDDINGS_INDEX_FILE)
+
+def save_content_cache(articles: List[Dict]) -> None:
+    """Write articles to the JSON cache (embeddings go to the .npy sidecar) and refresh the pickle."""
+    metadata = [{k: v for k, v in a.items() if k != 'embedding' and k not in _DERIVED_FIELDS} for a in articles]
+    if ORJSON_AVAILABLE:
+        with open(CONTENT_CACHE_FILE, 'wb') as f:
+            f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2 if PRETTY_CACHE_JSON else 0))
+    else:
+        # json.dump() issues one write per token; serialize first and write once
+        with open(CONTENT_CACHE_FILE, 'w') as f:
+            f.write(json.dumps(metadata, indent=2 if PRETTY_CACHE_JSON else None))
+    try:
+        with open(CONTENT_CACHE_PICKLE, 'wb') as f:
+            pickle.dump(metadata, f, protocol=5)
+    except OSError:
+        pass
+    save_embeddings_cache(articles)
+
+# Returned by _fetch_html when the server answers a conditional GET with 304
+NOT_MODIFIED = object()
+
+# Article fields carried over unchanged when a page hasn't changed since the last scrape
+_REUSED_ARTICLE_FIELDS = ('title', 'content', 'content_preview', 'description', 'thumbnail', 'states', 'embedding')
+
+def _fetch_html(url: str, article: Optional[Dict] = None):
+    """Return the body of an HTML page, or None if the URL serves something else.
+    
+    The response is streamed so PDFs and images are rejected on their headers
+    without downloading the body. HTTP errors are raised as usual.
+    
+    If an article is given, its stored etag/last_modified are sent as a
+    conditional GET and replaced by the response's; NOT_MODIFIED is returned
+    on a 304.
+    """
+    headers = {}
+    if article is not None:
+        if article.get('etag'):
+            headers['If-None-Match'] = article['etag']
+        if article.get('last_modified'):
+            headers['If-Modified-Since'] = article['last_modified']
+    
+    with _HTTP_SESSION.get(url, headers=headers, timeout=10, allow_redirects=True, stream=True) as response:
+        if response.status_code == 304:
+            return NOT_MODIFIED
+        response.raise_for_status()
+        if article is not None:
+            article['etag'] = response.headers.get('ETag', '')
+            article['last_modified'] = response.headers.get('Last-Modified', '')
+        if 'text/html' not in response.headers.get('content-type', ''):
+            return None
+        return response.content
+
+
+def _scrape_article_page(article: Dict, previous: Optional[Dict] = None) -> None:
+    """Fetch one discovered page and fill in its content, description, thumbnail and states.
+    
+    If the page was in the previous cache and the server reports it unchanged,
+    the previous content (and embedding) is reused without re-parsing.
+    
+    Runs on worker threads, so it must not call Streamlit; failures leave the article as-is.
+    """
+    from bs4 import BeautifulSoup
+    
+    try:
+        if previous:
+            article['etag'] = previous.get('etag', '')
+            article['last_modified'] = previous.get('last_modified', '')
+        
+        html = _fetch_html(article['url'], article)
+        if html is NOT_MODIFIED:
+            for field in _REUSED_ARTICLE_FIELDS:
+                if field in previous:
+                    article[field] = previous[field]
+            return
+        if html is None:
+            return
+        
+        soup = BeautifulSoup(html, HTML_PARSER)
+        
+        # Get page title if not already set
+        if not article['title'] or article['title'] == article['url'].split('/')[-1]:
+            title_elem = soup.find('title')
+            if title_elem:
+                article['title'] = title_elem.get_text(strip=True)
+        
+        # Extract main content
+        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.find('body')
+        if main_content:
+            # Remove script and style elements
+            for script in main_content(["script", "style", "nav", "header", "footer", "aside"]):
+                script.decompose()
+            content_text = main_content.get_text(strip=True, separator=' ')
+            article['content'] = content_text[:5000]  # Increased limit for comprehensive cache
+            article['content_preview'] = content_text[:300]  # Used by export_cache_list.py
+        
+        # Extract meta description
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            article['description'] = meta_desc.get('content', '')
+        else:
+            og_desc = soup.find('meta', attrs={'property': 'og:description'})
+            if og_desc:
+                article['description'] = og_desc.get('content', '')
+        
+        # Extract thumbnail/image
+        # Try og:image first (most reliable)
+        og_image = soup.find('meta', attrs={'property': 'og:image'})
+        if og_image and og_image.get('content'):
+            image_url = og_image.get('content')
+            # Make absolute URL if relative
+            if image_url.startswith('/'):
+                image_url = urljoin(WEBSITE_URL, image_url)
+            article['thumbnail'] = image_url
+        else:
+            # Try twitter:image
+            twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
+            if twitter_image and twitter_image.get('content'):
+                image_url = twitter_image.get('content')
+                if image_url.startswith('/'):
+                    image_url = urljoin(WEBSITE_URL, image_url)
+                article['thumbnail'] = image_url
+            else:
+                # Try to find first large image in content
+                img_tags = soup.find_all('img', src=True)
+                for img in img_tags:
+                    src = img.get('src', '')
+                    if src and not any(skip in src.lower() for skip in ['icon', 'logo', 'avatar', 'button']):
+                        if src.startswith('/'):
+                            src = urljoin(WEBSITE_URL, src)
+                        elif not src.startswith('http'):
+                            src = urljoin(article['url'], src)
+                        # Check if it's a reasonable size (not tiny icons)
+                        width = img.get('width', '')
+                        height = img.get('height', '')
+                        if (width and int(width) > 200) or (height and int(height) > 200) or not (width or height):
+                            article['thumbnail'] = src
+                            break
+        
+        # Extract location/state mentions
+        # First, try to extract from structured "Location" field on case study pages
+        mentioned_states = []
+        
+        # Look for "Location" label/heading in the HTML (case studies have this)
+        # Try multiple patterns to find the location field
+        location_text = None
+        
+        # Visible page text, extracted once: it screens pattern 1 and is searched by pattern 3
+        page_text = soup.get_text(separator=' ', strip=True)
+        
+        # Pattern 1: Look for elements with "Location" text followed by location info
+        # (only walk the tree for the label when the visible text actually contains it)
+        location_heading = soup.find(string=_RE_LOCATION_LABEL) if _RE_LOCATION_LABEL.search(page_text) else None
+        if location_heading:
+            # Find the next sibling or parent that contains the actual location
+            parent = location_heading.find_parent()
+            if parent:
+                # Get all text from the parent container
+                container_text = parent.get_text(separator=' ', strip=True)
+                # Look for "City, State" pattern after "Location"
+                location_match = _RE_LOCATION_CITY_STATE.search(container_text)
+                if location_match:
+                    location_text = location_match.group(2).strip()
+                # Also try simpler pattern: just find state after comma
+                if not location_text:
+                    location_match = _RE_LOCATION_STATE.search(container_text)
+                    if location_match:
+                        location_text = location_match.group(1).strip()
+        
+        # Pattern 2: Look for case_study_location class or similar
+        location_div = soup.find(class_=_RE_LOCATION_CLASS)
+        if location_div and not location_text:
+            location_text = location_div.get_text(strip=True)
+            # Extract state from "City, State" format
+            location_match = _RE_STATE_AFTER_COMMA.search(location_text)
+            if location_match:
+                location_text = location_match.group(1).strip()
+        
+        # Pattern 3: Search entire page content for "Location: City, State" pattern
+        if not location_text:
+            location_match = _RE_LOCATION_PAGE.search(page_text)
+            if location_match:
+                location_text = location_match.group(2).strip()
+        
+        # Map state name to abbreviation if found
+        if location_text:
+            state_lower = location_text.lower()
+            if state_lower in FULL_STATE_NAMES:
+                mentioned_states.append(FULL_STATE_NAMES[state_lower])
+        
+        # If no structured location found, search content but with stricter matching
+        if not mentioned_states:
+            mentioned_states = find_state_mentions(article.get('content', ''))
+        
+        if mentioned_states:
+            article['states'] = list(set(mentioned_states))  # Remove duplicates
+        
+    except Exception:
+        return
+
+def _save_scrape_checkpoint(articles: List[Dict], next_index: int) -> None:
+    """Save a partly scraped article list; phase 2 resumes at next_index on the next scrape."""
+    data = {
+        'next_index': next_index,
+        'articles': [{k: v for k, v in a.items() if k != 'embedding'} for a in articles],
+    }
+    tmp_file = SCRAPE_CHECKPOINT_FILE + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(data) if ORJSON_AVAILABLE else json.dumps(data).encode('utf-8'))
+        os.replace(tmp_file, SCRAPE_CHECKPOINT_FILE)
+    except OSError:
+        pass  # Checkpoints are best-effort
+
+def _load_scrape_checkpoint() -> Optional[tuple]:
+    """Return (articles, next_index) from an interrupted scrape, or None if there isn't one."""
+    try:
+        with open(SCRAPE_CHECKPOINT_FILE, 'rb') as f:
+            data = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
+        return data['articles'], data['next_index']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _normalize_crawl_url(url: str) -> tuple:
+    """Return (url without query/fragment, dedup key) for a crawled URL.
+    
+    The key also lowercases the host and drops the trailing slash. The URL
+    keeps its slash so fetching it doesn't cost a redirect.
+    """
+    parts = urlsplit(url)
+    stripped = urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+    key = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip('/') or '/', '', ''))
+    return stripped, key
+
 def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
     """Scrape content from ridewithvia.com and cache it.
     
@@ -111,31 +582,37 @@ def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
         force_refresh: If True, ignore cache and re-scrape everything
     """
     # Always use cache if it exists (unless force_refresh)
-    if not force_refresh and os.path.exists(CONTENT_CACHE_FILE):
+    previous_by_url = {}
+    if force_refresh and os.path.exists(CONTENT_CACHE_FILE):
+        # Keep the old cache around so unchanged pages can be revalidated instead of re-downloaded
         try:
-            with open(CONTENT_CACHE_FILE, 'r') as f:
-                cached = json.load(f)
-                if cached:  # Only use cache if it has content
-                    # Check if embeddings exist (they might not if cache was created before embedding feature)
-                    articles_with_embeddings = sum(1 for a in cached if a.get('embedding'))
-                    if articles_with_embeddings < len(cached):
-                        st.info(f"✅ Using cached content ({len(cached)} articles). {articles_with_embeddings}/{len(cached)} have embeddings. Embeddings will be generated on-demand.")
-                    else:
-                        st.success(f"✅ Using cached content ({len(cached)} articles) with embeddings. Ready for semantic search!")
-                    return cached
+            previous_by_url = {a['url']: a for a in load_content_cache()}
+        except Exception:
+            previous_by_url = {}
+    elif os.path.exists(CONTENT_CACHE_FILE):
+        try:
+            cached = load_content_cache()
+            if cached:  # Only use cache if it has content
+                # Check if embeddings exist (they might not if cache was created before embedding feature)
+                articles_with_embeddings = sum(1 for a in cached if has_embedding(a))
+                if articles_with_embeddings < len(cached):
+                    st.info(f"✅ Using cached content ({len(cached)} articles). {articles_with_embeddings}/{len(cached)} have embeddings. Embeddings will be generated on-demand.")
+                else:
+                    st.success(f"✅ Using cached content ({len(cached)} articles) with embeddings. Ready for semantic search!")
+                return cached
         except Exception as e:
             st.warning(f"Error loading cache: {e}. Re-scraping...")
     
+    from bs4 import BeautifulSoup, SoupStrainer
+    
     progress_bar = st.progress(0)
     status_text = st.empty()
     status_text.info("Building comprehensive content cache... This may take a few minutes.")
     articles = []
     seen_urls = set()
-    urls_to_visit = []
+    urls_to_visit = deque()
     
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        
         # Start with main pages - crawl from these
         seed_urls = [
             '/',
@@ -150,21 +627,30 @@ def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
             '/about/',
         ]
         
-        # Phase 1: Discover all URLs
-        status_text.info("Phase 1: Discovering all pages on the website...")
-        for seed in seed_urls:
-            url = urljoin(WEBSITE_URL, seed)
-            urls_to_visit.append(url)
+        checkpoint = _load_scrape_checkpoint()
+        if checkpoint:
+            # An earlier scrape was interrupted: keep its discovered pages and finished content,
+            # leave the frontier empty so phase 1 is skipped, and resume phase 2 where it stopped
+            articles, start_index = checkpoint
+            status_text.info(f"Resuming interrupted scrape at page {start_index + 1}/{len(articles)}...")
+        else:
+            start_index = 0
+            # Phase 1: Discover all URLs
+            status_text.info("Phase 1: Discovering all pages on the website...")
+            for seed in seed_urls:
+                url = urljoin(WEBSITE_URL, seed)
+                urls_to_visit.append(url)
         
         visited_count = 0
         max_pages = 200  # Limit to prevent infinite loops
         
         while urls_to_visit and visited_count < max_pages:
-            current_url = urls_to_visit.pop(0)
-            if current_url in seen_urls:
+            current_url = urls_to_visit.popleft()
+            current_key = _normalize_crawl_url(current_url)[1]
+            if current_key in seen_urls:
                 continue
             
-            seen_urls.add(current_url)
+            seen_urls.add(current_key)
             visited_count += 1
             
             if visited_count % 10 == 0:
@@ -172,14 +658,13 @@ def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
                 status_text.info(f"Discovering pages... Found {len(seen_urls)} unique URLs")
             
             try:
-                response = requests.get(current_url, timeout=10, headers=headers, allow_redirects=True)
-                response.raise_for_status()
-                
                 # Only process HTML pages
-                if 'text/html' not in response.headers.get('content-type', ''):
+                html = _fetch_html(current_url)
+                if html is None:
                     continue
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # Link discovery only looks at <a> and <title>, so skip building the rest of the tree
+                soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer(['a', 'title']))
                 
                 # Extract all links on this page
                 for link in soup.find_all('a', href=True):
@@ -187,20 +672,29 @@ def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
                     if not href:
                         continue
                     
-                    # Normalize URL
-                    if href.startswith('/'):
+                    # Skip nav/external links before any URL building; a relevant URL always
+                    # has one of the content paths in its href already
+                    if not _RE_RELEVANT_PATH.search(href):
+                        continue
+                    
+                    # Normalize URL (plain site-relative paths don't need urljoin)
+                    if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+                        full_url = WEBSITE_URL + href
+                    elif href.startswith('/'):
                         full_url = urljoin(WEBSITE_URL, href)
                     elif href.startswith('http') and 'ridewithvia.com' in href:
                         full_url = href
                     else:
                         continue
                     
-                    # Only include ridewithvia.com pages
-                    if 'ridewithvia.com' in full_url and full_url not in seen_urls:
+                    # Only include ridewithvia.com pages; seen_urls holds canonical keys so
+                    # /solutions, /solutions/ and /solutions/?ref=nav are one page
+                    full_url, url_key = _normalize_crawl_url(full_url)
+                    if 'ridewithvia.com' in full_url and url_key not in seen_urls:
                         # Filter to relevant content pages - include audience, solutions, resources directories
-                        if any(path in full_url for path in ['/blog/', '/resources/', '/solutions/', '/audience/', '/case-studies/', '/about/']):
+                        if _RE_RELEVANT_PATH.search(full_url):
                             urls_to_visit.append(full_url)
-                            seen_urls.add(full_url)
+                            seen_urls.add(url_key)
                             
                             # Extract title
                             title = link.get_text(strip=True) or link.get('title', '') or link.get('aria-label', '')
@@ -239,187 +733,32 @@ def scrape_website_content(force_refresh: bool = False) -> List[Dict]:
         total_articles = len(articles)
         status_text.info(f"Phase 2: Scraping content from {total_articles} pages...")
         
-        for idx, article in enumerate(articles):
-            progress_bar.progress(0.5 + (idx + 1) / total_articles * 0.5)
-            
-            if (idx + 1) % 10 == 0:
-                status_text.info(f"Scraping content... {idx + 1}/{total_articles} pages")
-            
-            try:
-                response = requests.get(article['url'], timeout=10, headers=headers, allow_redirects=True)
-                response.raise_for_status()
-                
-                if 'text/html' not in response.headers.get('content-type', ''):
-                    continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Get page title if not already set
-                if not article['title'] or article['title'] == article['url'].split('/')[-1]:
-                    title_elem = soup.find('title')
-                    if title_elem:
-                        article['title'] = title_elem.get_text(strip=True)
-                
-                # Extract main content
-                main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.find('body')
-                if main_content:
-                    # Remove script and style elements
-                    for script in main_content(["script", "style", "nav", "header", "footer", "aside"]):
-                        script.decompose()
-                    content_text = main_content.get_text(strip=True, separator=' ')
-                    article['content'] = content_text[:5000]  # Increased limit for comprehensive cache
-                
-                # Extract meta description
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                if meta_desc:
-                    article['description'] = meta_desc.get('content', '')
-                else:
-                    og_desc = soup.find('meta', attrs={'property': 'og:description'})
-                    if og_desc:
-                        article['description'] = og_desc.get('content', '')
-                
-                # Extract thumbnail/image
-                # Try og:image first (most reliable)
-                og_image = soup.find('meta', attrs={'property': 'og:image'})
-                if og_image and og_image.get('content'):
-                    image_url = og_image.get('content')
-                    # Make absolute URL if relative
-                    if image_url.startswith('/'):
-                        image_url = urljoin(WEBSITE_URL, image_url)
-                    article['thumbnail'] = image_url
-                else:
-                    # Try twitter:image
-                    twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
-                    if twitter_image and twitter_image.get('content'):
-                        image_url = twitter_image.get('content')
-                        if image_url.startswith('/'):
-                            image_url = urljoin(WEBSITE_URL, image_url)
-                        article['thumbnail'] = image_url
-                    else:
-                        # Try to find first large image in content
-                        img_tags = soup.find_all('img', src=True)
-                        for img in img_tags:
-                            src = img.get('src', '')
-                            if src and not any(skip in src.lower() for skip in ['icon', 'logo', 'avatar', 'button']):
-                                if src.startswith('/'):
-                                    src = urljoin(WEBSITE_URL, src)
-                                elif not src.startswith('http'):
-                                    src = urljoin(article['url'], src)
-                                # Check if it's a reasonable size (not tiny icons)
-                                width = img.get('width', '')
-                                height = img.get('height', '')
-                                if (width and int(width) > 200) or (height and int(height) > 200) or not (width or height):
-                                    article['thumbnail'] = src
-                                    break
-                
-                # Extract location/state mentions
-                # First, try to extract from structured "Location" field on case study pages
-                mentioned_states = []
-                
-                # Look for "Location" label/heading in the HTML (case studies have this)
-                # Try multiple patterns to find the location field
-                location_text = None
-                
-                # Pattern 1: Look for elements with "Location" text followed by location info
-                location_heading = soup.find(string=re.compile(r'Location', re.I))
-                if location_heading:
-                    # Find the next sibling or parent that contains the actual location
-                    parent = location_heading.find_parent()
-                    if parent:
-                        # Get all text from the parent container
-                        container_text = parent.get_text(separator=' ', strip=True)
-                        # Look for "City, State" pattern after "Location"
-                        location_match = re.search(r'Location[:\s]+([^,\n]+),\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', container_text, re.IGNORECASE)
-                        if location_match:
-                            location_text = location_match.group(2).strip()
-                        # Also try simpler pattern: just find state after comma
-                        if not location_text:
-                            location_match = re.search(r'Location[:\s]+[^,]+,\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', container_text, re.IGNORECASE)
-                            if location_match:
-                                location_text = location_match.group(1).strip()
-                
-                # Pattern 2: Look for case_study_location class or similar
-                location_div = soup.find(class_=re.compile(r'location', re.I))
-                if location_div and not location_text:
-                    location_text = location_div.get_text(strip=True)
-                    # Extract state from "City, State" format
-                    location_match = re.search(r',\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', location_text)
-                    if location_match:
-                        location_text = location_match.group(1).strip()
-                
-                # Pattern 3: Search entire page content for "Location: City, State" pattern
-                if not location_text:
-                    page_text = soup.get_text(separator=' ', strip=True)
-                    location_match = re.search(r'Location[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', page_text, re.IGNORECASE)
-                    if location_match:
-                        location_text = location_match.group(2).strip()
-                
-                # Map state name to abbreviation if found
-                if location_text:
-                    full_state_names = {
-                        'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
-                        'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
-                        'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA',
-                        'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
-                        'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS', 'missouri': 'MO',
-                        'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH', 'new jersey': 'NJ',
-                        'new mexico': 'NM', 'new york': 'NY', 'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
-                        'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
-                        'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
-                        'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
-                        'district of columbia': 'DC', 'washington dc': 'DC', 'dc': 'DC'
-                    }
-                    state_lower = location_text.lower()
-                    if state_lower in full_state_names:
-                        mentioned_states.append(full_state_names[state_lower])
-                
-                # If no structured location found, search content but with stricter matching
-                if not mentioned_states:
-                    content_lower = article.get('content', '').lower()
-                    content_full = article.get('content', '')
-                    
-                    # Use regex with word boundaries for state abbreviations to avoid false matches
-                    import re
-                    for state_abbr in STATE_COORDINATES.keys():
-                        # Match state abbreviation with word boundaries (not inside other words)
-                        # Pattern: word boundary, state code, word boundary or punctuation
-                        pattern = r'\b' + re.escape(state_abbr) + r'\b'
-                        if re.search(pattern, content_full, re.IGNORECASE):
-                            mentioned_states.append(state_abbr)
-                    
-                    # Check for full state names with word boundaries
-                    full_state_names = {
-                        'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
-                        'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
-                        'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL', 'indiana': 'IN', 'iowa': 'IA',
-                        'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
-                        'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN', 'mississippi': 'MS', 'missouri': 'MO',
-                        'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH', 'new jersey': 'NJ',
-                        'new mexico': 'NM', 'new york': 'NY', 'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
-                        'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC',
-                        'south dakota': 'SD', 'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
-                        'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
-                        'district of columbia': 'DC', 'washington dc': 'DC', 'dc': 'DC'
-                    }
-                    
-                    for state_name, state_abbr in full_state_names.items():
-                        # Use word boundaries to avoid matching "california" inside "californian" etc.
-                        pattern = r'\b' + re.escape(state_name) + r'\b'
-                        if re.search(pattern, content_lower) and state_abbr not in mentioned_states:
-                            mentioned_states.append(state_abbr)
+        # Untouched copies of the pages still being scraped, so checkpoints never read
+        # dicts that worker threads are filling in
+        discovered = [dict(a) for a in articles]
+        
+        with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+            # map() yields in submission order, so progress advances page by page
+            pending = articles[start_index:]
+            previous = [previous_by_url.get(a['url']) for a in pending]
+            for idx, _ in enumerate(executor.map(_scrape_article_page, pending, previous), start=start_index):
+                progress_bar.progress(0.5 + (idx + 1) / total_articles * 0.5)
                 
-                if mentioned_states:
-                    article['states'] = list(set(mentioned_states))  # Remove duplicates
+                if (idx + 1) % 10 == 0:
+                    status_text.info(f"Scraping content... {idx + 1}/{total_articles} pages")
                 
-            except Exception as e:
-                continue
+                # Everything up to idx is done; save it so an interrupted run can resume here
+                if (idx + 1) % SCRAPE_CHECKPOINT_EVERY == 0 and idx + 1 < total_articles:
+                    _save_scrape_checkpoint(articles[:idx + 1] + discovered[idx + 1:], idx + 1)
         
         progress_bar.empty()
         status_text.success(f"✅ Content cache built! Found {len(articles)} pages.")
         
         # Cache the results (embeddings will be generated on-demand)
-        with open(CONTENT_CACHE_FILE, 'w') as f:
-            json.dump(articles, f, indent=2)
+        _add_derived_fields(articles)
+        save_content_cache(articles)
+        if os.path.exists(SCRAPE_CHECKPOINT_FILE):
+            os.remove(SCRAPE_CHECKPOINT_FILE)
         
         st.success(f"✅ Content cached to {CONTENT_CACHE_FILE}. This cache will be used for all future sessions - no more scraping needed!")
         st.info("💡 Embeddings will be generated automatically when you ask questions for better semantic search.")
@@ -434,7 +773,9 @@ def get_articles_by_location(articles: List[Dict], user_state: str, max_distance
     if user_state not in STATE_COORDINATES:
         return articles
     
-    user_lat, user_lon = STATE_COORDINATES[user_state]
+    # Distance from the user's state to every state in one vectorized pass
+    distances = haversine_to_all(*STATE_COORDINATES[user_state])
+    nearby_states = set(STATE_CODES[distances <= max_distance].tolist())
     filtered = []
     articles_with_states = []
     articles_without_states = []
@@ -448,13 +789,8 @@ def get_articles_by_location(articles: List[Dict], user_state: str, max_distance
     
     # First, prioritize articles with state info that matches location
     for article in articles_with_states:
-        for state in article['states']:
-            if state in STATE_COORDINATES:
-                state_lat, state_lon = STATE_COORDINATES[state]
-                distance = calculate_distance(user_lat, user_lon, state_lat, state_lon)
-                if distance <= max_distance:
-                    filtered.append(article)
-                    break
+        if any(state in nearby_states for state in article['states']):
+            filtered.append(article)
     
     # If we have enough location-matched articles, return them
     if len(filtered) >= 4:
@@ -473,203 +809,329 @@ def get_articles_by_location(articles: List[Dict], user_state: str, max_distance
         random.shuffle(shuffled)
         return shuffled[:10] if shuffled else []
 
-def recommend_articles(articles: List[Dict], user_type: str, user_state: str, client: OpenAI) -> Dict:
+def _pick_numbered(items: List[Dict], numbers_text: str, n: int) -> List[Dict]:
+    """Items for the first n valid 1-based numbers in numbers_text (empty if none are valid)."""
+    selected_indices = [int(x) - 1 for x in _RE_NUMBERS.findall(numbers_text)[:n] if 0 <= int(x) - 1 < len(items)]
+    return [items[i] for i in selected_indices]
+
+def recommend_articles(articles: List[Dict], user_type: str, user_state: str, client: "OpenAI") -> Dict:
     """Recommend articles: 3 general + 2 geographically relevant case studies.
     
     Returns:
-        Dict with 'general' (list of 3) and 'case_studies' (list of 2 or message)
+        Dict with 'general' (list of 3) and 'case_studies' (list of 2 or message); 'fallback'
+        is True when the model pick failed and the first candidates were used instead
     """
     if not articles:
         return {'general': [], 'case_studies': []}
     
     # Filter articles by type
     if user_type == 'city':
-        relevant_articles = [a for a in articles if any(keyword in a.get('content', '').lower() or 
-                            keyword in a.get('title', '').lower() or
-                            keyword in a.get('description', '').lower()
-                            for keyword in ['microtransit', 'paratransit', 'city', 'municipal', 'urban'])]
+        keyword_re = _RE_CITY_KEYWORDS
     elif user_type == 'transit_agency':
-        relevant_articles = [a for a in articles if any(keyword in a.get('content', '').lower() or
-                            keyword in a.get('title', '').lower() or
-                            keyword in a.get('description', '').lower()
-                            for keyword in ['paratransit', 'transit', 'agency', 'public transportation'])]
+        keyword_re = _RE_AGENCY_KEYWORDS
+    else:
+        keyword_re = None
+    
+    if keyword_re:
+        relevant_articles = [a for a in articles if keyword_re.search(a.get('content', '')) or
+                             keyword_re.search(a.get('title', '')) or
+                             keyword_re.search(a.get('description', ''))]
     else:
         relevant_articles = articles
     
     # Separate case studies from general content
     # Case studies can be identified by: type, title, URL pattern, or content
-    case_studies = [a for a in relevant_articles if 
-                    'case-study' in a.get('type', '').lower() or 
-                    'case study' in a.get('title', '').lower() or
-                    'case study' in a.get('content', '').lower()[:500] or
-                    '/case-studies/' in a.get('url', '').lower() or
-                    '-case-study' in a.get('url', '').lower() or
-                    'case-study' in a.get('url', '').lower() or
-                    ('success story' in a.get('title', '').lower() or 'success story' in a.get('content', '').lower()[:500])]
-    
-    general_articles = [a for a in relevant_articles if a not in case_studies]
-    
-    # Get 3 general articles
-    if len(general_articles) <= 3:
-        selected_general = general_articles
-    else:
-        # Use LLM to select top 3 general articles
-        articles_summary = "\n".join([f"{i+1}. {a['title']} - {a.get('description', a.get('content', '')[:200])}" 
-                                      for i, a in enumerate(general_articles[:30])])
-        user_type_display = "city" if user_type == 'city' else "transit agency"
-        prompt = f"""Select the top 3 most relevant articles for a {user_type_display} in {user_state}:
+    case_studies = []
+    for a in relevant_articles:
+        title_lower = a.get('title', '').lower()
+        content_head = a.get('content', '')[:500].lower()
+        url_lower = a.get('url', '').lower()
+        if ('case-study' in a.get('type', '').lower() or
+                'case study' in title_lower or
+                'case study' in content_head or
+                '/case-studies/' in url_lower or
+                '-case-study' in url_lower or
+                'case-study' in url_lower or
+                ('success story' in title_lower or 'success story' in content_head)):
+            case_studies.append(a)
+    
+    # Identity set: `a not in case_studies` would compare dicts field by field for every article
+    case_study_ids = {id(a) for a in case_studies}
+    general_articles = [a for a in relevant_articles if id(a) not in case_study_ids]
+    
+    # Work out which lists are long enough to need an LLM pick; the first N is the fallback
+    selected_general = general_articles[:3]
+    need_general = len(general_articles) > 3
+    
+    # Get 4 geographically relevant case studies
+    location_case_studies = get_articles_by_location(case_studies, user_state, max_distance=500) if case_studies else []
+    selected_case_studies = location_case_studies[:4] or None  # None: no geographically relevant case studies
+    need_case = len(location_case_studies) > 4
+    
+    # Both selections go into a single completion, one reply line per list
+    fallback = False
+    if need_general or need_case:
+        sections = []
+        reply_lines = []
+        if need_general:
+            articles_summary = "\n".join([f"{i+1}. {a['title']} - {a.get('description', a.get('content', '')[:200])}" 
+                                          for i, a in enumerate(general_articles[:30])])
+            user_type_display = "city" if user_type == 'city' else "transit agency"
+            sections.append(f"""GENERAL: Select the top 3 most relevant articles for a {user_type_display} in {user_state}:
 
-{articles_summary}
+{articles_summary}""")
+            reply_lines.append("GENERAL: n, n, n")
+        if need_case:
+            articles_summary = "\n".join([f"{i+1}. {a['title']} - Location: {a.get('states', ['Unknown'])[0] if a.get('states') else 'Unknown'} - {a.get('description', a.get('content', '')[:200])}" 
+                                          for i, a in enumerate(location_case_studies[:30])])
+            sections.append(f"""CASE_STUDIES: Select the top 4 most relevant case studies for {user_state}. Prioritize case studies from {user_state} or nearby states:
 
-Return only the numbers (1-30) of the top 3 articles, separated by commas."""
+{articles_summary}""")
+            reply_lines.append("CASE: n, n, n, n")
+        
+        prompt = "\n\n".join(sections) + "\n\nReply with only these lines, using the numbers (1-30) from each list:\n" + "\n".join(reply_lines)
         
         try:
             response = client.chat.completions.create(
-                model="gpt-4",
+                model=SELECTION_MODEL,
                 messages=[
-                    {"role": "system", "content": "Return only numbers separated by commas, no other text."},
+                    {"role": "system", "content": "Return only the requested lines of numbers separated by commas, no other text."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=30
+                max_tokens=40
             )
-            import re
-            numbers = re.findall(r'\d+', response.choices[0].message.content.strip())
-            selected_indices = [int(x) - 1 for x in numbers[:3] if x.isdigit() and 0 <= int(x) - 1 < len(general_articles)]
-            selected_general = [general_articles[i] for i in selected_indices[:3]] if selected_indices else general_articles[:3]
-        except:
-            selected_general = general_articles[:3]
-    
-    # Get 4 geographically relevant case studies
-    if case_studies:
-        # Filter case studies by location
-        location_case_studies = get_articles_by_location(case_studies, user_state, max_distance=500)
-        
-        if location_case_studies:
-            # Use LLM to select top 4 geographically relevant case studies
-            if len(location_case_studies) <= 4:
-                selected_case_studies = location_case_studies
-            else:
-                articles_summary = "\n".join([f"{i+1}. {a['title']} - Location: {a.get('states', ['Unknown'])[0] if a.get('states') else 'Unknown'} - {a.get('description', a.get('content', '')[:200])}" 
-                                              for i, a in enumerate(location_case_studies[:30])])
-                prompt = f"""Select the top 4 most relevant case studies for {user_state}. Prioritize case studies from {user_state} or nearby states:
-
-{articles_summary}
-
-Return only the numbers (1-30) of the top 4 articles, separated by commas."""
-                try:
-                    response = client.chat.completions.create(
-                        model="gpt-4",
-                        messages=[
-                            {"role": "system", "content": "Return only numbers separated by commas, no other text."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=30
-                    )
-                    import re
-                    numbers = re.findall(r'\d+', response.choices[0].message.content.strip())
-                    selected_indices = [int(x) - 1 for x in numbers[:4] if x.isdigit() and 0 <= int(x) - 1 < len(location_case_studies)]
-                    selected_case_studies = [location_case_studies[i] for i in selected_indices[:4]] if selected_indices else location_case_studies[:4]
-                except:
-                    selected_case_studies = location_case_studies[:4]
-        else:
-            selected_case_studies = None  # No geographically relevant case studies
-    else:
-        selected_case_studies = None
+            reply = response.choices[0].message.content.strip()
+            # With only one list asked for, a reply of bare numbers is still unambiguous
+            single_list = not (need_general and need_case)
+            if need_general:
+                match = _RE_PICK_GENERAL.search(reply)
+                picked = _pick_numbered(general_articles, match.group(1) if match else (reply if single_list else ''), 3)
+                if picked:
+                    selected_general = picked
+                else:
+                    fallback = True  # Unparseable reply: keep the first candidates, but don't cache them
+            if need_case:
+                match = _RE_PICK_CASE.search(reply)
+                picked = _pick_numbered(location_case_studies, match.group(1) if match else (reply if single_list else ''), 4)
+                if picked:
+                    selected_case_studies = picked
+                else:
+                    fallback = True
+        except Exception:
+            fallback = True
     
     return {
         'general': selected_general,
-        'case_studies': selected_case_studies
+        'case_studies': selected_case_studies,
+        'fallback': fallback
     }
 
-def get_article_embedding(article: Dict, client: OpenAI, save_to_cache: bool = True) -> Optional[List[float]]:
-    """Generate embedding for an article. Returns embedding and optionally saves to cache."""
-    if 'embedding' in article and article['embedding']:
-        return article['embedding']
+def articles_version(articles: List[Dict]) -> int:
+    """Cheap fingerprint of the fields recommendations and answers depend on.
+    
+    Computed once when articles are loaded and passed to cached helpers in place of
+    the articles themselves, which st.cache_data would otherwise deep-hash on every call.
+    """
+    return hash(tuple((a.get('url'), a.get('title'), a.get('description'), a.get('content'),
+                       a.get('type'), tuple(a.get('states') or ())) for a in articles))
+
+class _UncachedResult(Exception):
+    """Carries a result out of an st.cache_data function without it being cached."""
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+@st.cache_data(show_spinner=False, max_entries=128, ttl=3600)
+def _recommendations_cache(user_type: str, user_state: str, version: int,
+                           _articles: List[Dict], _client: "OpenAI") -> Dict:
+    result = recommend_articles(_articles, user_type, user_state, _client)
+    if result.get('fallback'):
+        # Don't keep a degraded pick (rate limit, timeout) for every session
+        raise _UncachedResult(result)
+    return result
+
+def _cached_recommendations(user_type: str, user_state: str, version: int,
+                            articles: List[Dict], client: "OpenAI") -> Dict:
+    """recommend_articles() memoized per profile and article set.
+    
+    version (see articles_version) stands in for the article set, which isn't hashed.
+    Results where the model pick failed are returned but not cached, so the next rerun retries.
+    """
+    try:
+        return _recommendations_cache(user_type, user_state, version, articles, client)
+    except _UncachedResult as e:
+        return e.result
+
+@lru_cache(maxsize=1)
+def _get_embedding_encoder():
+    """tiktoken encoding for EMBEDDING_MODEL, or None if tiktoken (or its BPE file download) is unavailable.
+    
+    Looked up by EMBEDDING_ENCODING rather than encoding_for_model(), which doesn't know
+    the text-embedding-3 models on older tiktoken releases.
+    """
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(EMBEDDING_ENCODING)
+    except Exception:
+        return None
+
+def _embedding_text(article: Dict) -> str:
+    """Text used to embed an article: title + description + first part of content.
     
-    # Create text for embedding: title + description + first part of content
+    Truncated to EMBEDDING_MAX_TOKENS tokens when tiktoken is available,
+    otherwise to the first 500 chars of content.
+    """
+    encoder = _get_embedding_encoder()
     text_parts = []
     if article.get('title'):
         text_parts.append(article['title'])
     if article.get('description'):
         text_parts.append(article['description'])
     if article.get('content'):
-        # Use first 500 chars of content for embedding
-        text_parts.append(article['content'][:500])
-    
+        # Without a tokenizer, use first 500 chars of content for embedding
+        text_parts.append(article['content'] if encoder else article['content'][:500])
     text = ' '.join(text_parts)
-    if not text.strip():
-        return None
     
-    try:
+    if encoder:
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) > EMBEDDING_MAX_TOKENS:
+            text = encoder.decode(tokens[:EMBEDDING_MAX_TOKENS])
+    return text
+
+def embed_missing_articles(articles: List[Dict], client: "OpenAI") -> int:
+    """Embed every article that lacks an embedding, EMBEDDING_BATCH_SIZE texts per API call.
+    
+    Returns the number of embeddings generated.
+    """
+    pending = []
+    for article in articles:
+        if not has_embedding(article):
+            text = _embedding_text(article)
+            if text.strip():
+                pending.append((article, text))
+    
+    if not pending:
+        return 0
+    
+    def embed_batch(batch: List[tuple]) -> int:
         response = client.embeddings.create(
             model=EMBEDDING_MODEL,
-            input=text
+            input=[text for _, text in batch]
         )
-        embedding = response.data[0].embedding
-        
-        # Save embedding to article dict (will be saved to cache later)
-        if save_to_cache:
-            article['embedding'] = embedding
-        
-        return embedding
-    except Exception as e:
-        st.warning(f"Error generating embedding: {e}")
-        return None
+        # Results come back with the index of the input they belong to
+        for item in response.data:
+            batch[item.index][0]['embedding'] = unit_vector(item.embedding)
+        return len(response.data)
+    
+    batches = [pending[start:start + EMBEDDING_BATCH_SIZE] for start in range(0, len(pending), EMBEDDING_BATCH_SIZE)]
+    generated = 0
+    errors = []
+    # Batches are independent requests, so overlap them; Streamlit calls stay on this thread
+    with ThreadPoolExecutor(max_workers=min(EMBEDDING_WORKERS, len(batches))) as executor:
+        for future in [executor.submit(embed_batch, batch) for batch in batches]:
+            try:
+                generated += future.result()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        st.warning(f"Error generating embeddings: {errors[0]}")
+    return generated
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _embed_query(query: str, _client: "OpenAI") -> np.ndarray:
+    """Embed a search query as a unit vector; repeated queries are served from Streamlit's cache across reruns.
+    
+    Keyed by the query text only (the client is not hashed).
+    """
+    response = _client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=query
+    )
+    return unit_vector(response.data[0].embedding)
 
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-    """Calculate cosine similarity between two vectors."""
-    a = np.array(a)
-    b = np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+def _get_search_matrix(articles: List[Dict]) -> tuple:
+    """Return (article indices, float32 matrix of their unit-length embeddings).
+    
+    Rows are reused from this session's previous search when the embedding object is the
+    same, so only newly generated (or reloaded) embeddings are copied in. The entry lives in
+    st.session_state (module globals reset on every rerun): each session has its own article
+    objects, and holding the embeddings keeps their id()s valid for the reuse check.
+    """
+    rows = [i for i, article in enumerate(articles) if has_embedding(article)]
+    if not rows:
+        return rows, None
+    embeddings = [articles[i]['embedding'] for i in rows]
+    cached_embeddings, cached_matrix = st.session_state.get('search_matrix', ([], None))
+    
+    cached_row = {id(e): k for k, e in enumerate(cached_embeddings)}
+    reuse = [cached_row.get(id(e)) for e in embeddings]
+    if cached_matrix is not None and len(cached_embeddings) == len(embeddings) and reuse == list(range(len(embeddings))):
+        return rows, cached_matrix
+    
+    new_rows = [k for k, r in enumerate(reuse) if r is None]
+    if cached_matrix is None or len(new_rows) == len(rows):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+    else:
+        matrix = np.empty((len(rows), cached_matrix.shape[1]), dtype=np.float32)
+        kept = [k for k, r in enumerate(reuse) if r is not None]
+        matrix[kept] = cached_matrix[[reuse[k] for k in kept]]
+        if new_rows:
+            matrix[new_rows] = np.asarray([embeddings[k] for k in new_rows], dtype=np.float32)
+    
+    st.session_state.search_matrix = (embeddings, matrix)
+    return rows, matrix
 
-def find_similar_articles(query: str, articles: List[Dict], client: OpenAI, top_k: int = 25) -> List[Dict]:
+def find_similar_articles(query: str, articles: List[Dict], client: "OpenAI", top_k: int = 25) -> List[Dict]:
     """Find most similar articles to query using semantic search."""
     # Generate embedding for query
     try:
-        query_response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=query
-        )
-        query_embedding = query_response.data[0].embedding
+        query_embedding = _embed_query(query, client)
     except Exception as e:
         st.warning(f"Error generating query embedding: {e}")
         # Fallback to keyword matching
         return articles[:top_k]
     
-    # Get or generate embeddings for articles
-    article_scores = []
-    embeddings_generated = 0
-    for article in articles:
-        embedding = get_article_embedding(article, client, save_to_cache=True)
-        if embedding:
-            similarity = cosine_similarity(query_embedding, embedding)
-            article_scores.append((similarity, article))
-            if 'embedding' not in article or not article.get('embedding'):
-                embeddings_generated += 1
-        else:
-            # If embedding fails, give it a low score
-            article_scores.append((0.0, article))
+    # Generate any missing article embeddings in batched API calls
+    embeddings_generated = embed_missing_articles(articles, client)
+    
+    # Article and query embeddings are unit vectors, so one matrix-vector product gives
+    # every cosine similarity. Articles whose embedding failed keep a score of 0.
+    scores = np.zeros(len(articles), dtype=np.float32)
+    rows, matrix = _get_search_matrix(articles)
+    if rows:
+        scores[rows] = matrix @ query_embedding
     
-    # Save updated articles with embeddings to cache
+    # Save new embeddings to the sidecar (article metadata is unchanged)
     if embeddings_generated > 0:
         try:
-            with open(CONTENT_CACHE_FILE, 'w') as f:
-                json.dump(articles, f, indent=2)
+            save_embeddings_cache(articles)
         except Exception as e:
             pass  # Silently fail - not critical
     
-    # Sort by similarity score (highest first)
-    article_scores.sort(key=lambda x: x[0], reverse=True)
+    # Top K by similarity (highest first) without sorting every score: partition to find the
+    # k-th best score, then stable-sort only the candidates at or above it, so ties still
+    # keep article order exactly as a full stable sort would
+    neg_scores = -scores
+    if 0 < top_k < len(neg_scores):
+        kth = np.partition(neg_scores, top_k - 1)[top_k - 1]
+        candidates = np.flatnonzero(neg_scores <= kth)
+    else:
+        candidates = np.arange(len(neg_scores))
+    order = candidates[np.argsort(neg_scores[candidates], kind='stable')][:top_k]
     
     # Return top K articles
-    return [article for _, article in article_scores[:top_k]]
+    return [articles[i] for i in order]
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_google_sheets_config_status() -> Dict:
     """
     Return a status dict for diagnostics (no secrets exposed).
     Keys: 'configured' (bool), 'reason' (str), 'hint' (str).
+    Cached for 5 minutes. Failed connections aren't cached by the Sheets client, so a
+    fixed secret clears the banner within that time; a client that already connected
+    keeps its credentials until _authorize_google_sheets.clear() is called.
     """
     if not GSPREAD_AVAILABLE:
         return {
@@ -698,9 +1160,10 @@ def get_google_sheets_config_status() -> Dict:
                 'reason': 'service_account_json missing in [google_sheets]',
                 'hint': 'Paste your full service account JSON (from Google Cloud Console) as service_account_json. In the JSON, keep private_key on one line with \\n for newlines.',
             }
-        # Try to actually connect (without exposing secrets)
-        client = get_google_sheets_client()
-        if client is None:
+        # Try to actually connect (without exposing secrets); failures are retried on the next check
+        try:
+            _authorize_google_sheets()
+        except Exception:
             return {
                 'configured': False,
                 'reason': 'Credentials present but connection failed',
@@ -715,41 +1178,66 @@ def get_google_sheets_config_status() -> Dict:
         }
 
 
-def get_google_sheets_client():
-    """Initialize Google Sheets client using Streamlit secrets."""
-    if not GSPREAD_AVAILABLE:
-        return None
+@st.cache_data(ttl=300, show_spinner=False)
+def _find_default_creds_paths() -> Tuple[str, ...]:
+    """Return the local service-account files that exist, in lookup order.
     
+    Cached across reruns and rechecked every five minutes, so a credentials file added
+    while the app is running is picked up without a restart.
+    """
+    # Try multiple possible paths relative to current working directory
+    script_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
+    default_creds_paths = [
+        'google_sheets_credentials.json',
+        os.path.join(script_dir, 'google_sheets_credentials.json'),
+        '../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json',
+        '../../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json',
+        os.path.join(script_dir, '../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json'),
+        os.path.join(script_dir, '../../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json'),
+    ]
+    found = []
+    for creds_path in default_creds_paths:
+        full_path = os.path.abspath(creds_path)
+        if full_path not in found and os.path.exists(full_path):
+            found.append(full_path)
+    return tuple(found)
+
+
+@st.cache_resource(show_spinner=False)
+def _authorize_google_sheets():
+    """Authorize a gspread client from the first credentials source that works.
+    
+    Raises RuntimeError if none does. Streamlit doesn't cache exceptions, so only a
+    successful client is kept (once per process, shared by all sessions); call
+    _authorize_google_sheets.clear() after changing credentials.
+    """
+    errors = []
     try:
         # Try to get credentials from Streamlit secrets
         try:
             # Option 1: Service account JSON as string in secrets
             if 'google_sheets' in st.secrets and 'service_account_json' in st.secrets['google_sheets']:
                 creds_json = st.secrets['google_sheets']['service_account_json']
-                if isinstance(creds_json, str):
-                    # Try to parse as JSON string
+                if not isinstance(creds_json, str):
+                    # Streamlit already parsed a TOML table into a mapping
+                    creds_dict = creds_json
+                else:
                     try:
                         creds_dict = json.loads(creds_json)
                     except json.JSONDecodeError:
-                        # If it's already a dict (Streamlit might parse it), use it directly
-                        creds_dict = creds_json if isinstance(creds_json, dict) else json.loads(creds_json.replace('\\n', '\n'))
-                else:
-                    creds_dict = creds_json
+                        # Escaped newlines pasted into the secret can break the JSON itself
+                        creds_dict = json.loads(creds_json.replace('\\n', '\n'))
                 # Ensure private_key has real newlines if stored as \n
-                if isinstance(creds_dict.get('private_key'), str) and '\\n' in creds_dict['private_key']:
-                    creds_dict = dict(creds_dict)
-                    creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
+                private_key = creds_dict.get('private_key')
+                if isinstance(private_key, str) and '\\n' in private_key:
+                    creds_dict = dict(creds_dict, private_key=private_key.replace('\\n', '\n'))
                 creds = Credentials.from_service_account_info(creds_dict, scopes=[
                     'https://www.googleapis.com/auth/spreadsheets',
                     'https://www.googleapis.com/auth/drive'
                 ])
                 return gspread.authorize(creds)
         except (AttributeError, KeyError, FileNotFoundError, json.JSONDecodeError) as e:
-            # Store error for debugging
-            if 'logging_errors' not in st.session_state:
-                st.session_state.logging_errors = []
-            st.session_state.logging_errors.append(f"Error loading credentials from secrets: {str(e)}")
-            pass
+            errors.append(f"Error loading credentials from secrets: {str(e)}")
         
         # Option 2: Service account file path (for local development)
         try:
@@ -764,31 +1252,33 @@ def get_google_sheets_client():
             pass
         
         # Option 3: Try default local credentials file paths (for local development)
-        # Try multiple possible paths relative to current working directory
-        script_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
-        default_creds_paths = [
-            'google_sheets_credentials.json',
-            os.path.join(script_dir, 'google_sheets_credentials.json'),
-            '../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json',
-            '../../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json',
-            os.path.join(script_dir, '../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json'),
-            os.path.join(script_dir, '../../GitLab/rgrowth-all/Product_Education_Machine/Product Education Machine.json'),
-        ]
-        
-        for creds_path in default_creds_paths:
-            full_path = os.path.abspath(creds_path) if not os.path.isabs(creds_path) else creds_path
-            if os.path.exists(full_path):
-                try:
-                    creds = Credentials.from_service_account_file(full_path, scopes=[
-                        'https://www.googleapis.com/auth/spreadsheets',
-                        'https://www.googleapis.com/auth/drive'
-                    ])
-                    return gspread.authorize(creds)
-                except Exception:
-                    continue
-        
+        for full_path in _find_default_creds_paths():
+            try:
+                creds = Credentials.from_service_account_file(full_path, scopes=[
+                    'https://www.googleapis.com/auth/spreadsheets',
+                    'https://www.googleapis.com/auth/drive'
+                ])
+                return gspread.authorize(creds)
+            except Exception as e:
+                errors.append(f"Error loading credentials from {full_path}: {str(e)}")
+    except Exception as e:
+        errors.append(f"Error authorizing Google Sheets: {str(e)}")
+    raise RuntimeError('; '.join(errors) or "No Google Sheets credentials found")
+
+def get_google_sheets_client():
+    """Return the shared Google Sheets client, or None if it can't be authorized.
+    
+    Failures aren't cached, so the next call tries again; the reason is kept in this
+    session's logging_errors for debugging.
+    """
+    if not GSPREAD_AVAILABLE:
         return None
+    try:
+        return _authorize_google_sheets()
     except Exception as e:
+        errors = st.session_state.setdefault('logging_errors', [])
+        if str(e) not in errors:
+            errors.append(str(e))
         return None
 
 
@@ -804,9 +1294,160 @@ def _get_worksheet(spreadsheet, sheet_name: str):
         return None
 
 
-def log_qa_pair(question: str, answer: str) -> bool:
+@st.cache_data(show_spinner=False)
+def _read_sheet_ids() -> Tuple[str, str]:
+    """Read (spreadsheet_id, sheet_name) from the [google_sheets] secrets section.
+    
+    Raises if the secrets or the section are missing; Streamlit doesn't cache exceptions,
+    so only a successful read is kept and a section added later is picked up.
+    """
+    gs = st.secrets['google_sheets']
+    return (gs.get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID),
+            gs.get('sheet_name', GOOGLE_SHEETS_SHEET_NAME))
+
+def _resolve_sheet_ids() -> Tuple[str, str]:
+    """Return (spreadsheet_id, sheet_name) for the Q&A log from secrets, falling back to the defaults."""
+    try:
+        return _read_sheet_ids()
+    except (AttributeError, KeyError, FileNotFoundError):
+        return GOOGLE_SHEETS_SPREADSHEET_ID, GOOGLE_SHEETS_SHEET_NAME
+
+
+def get_qa_worksheet(spreadsheet_id: str, sheet_name: str):
+    """Return the Q&A log worksheet, or None if Google Sheets isn't configured.
+    
+    Errors opening the sheet propagate to the caller and are retried on the next call.
+    """
+    client = get_google_sheets_client()
+    if not client:
+        return None
+    return _open_qa_worksheet(spreadsheet_id, sheet_name, client)
+
+@st.cache_resource(show_spinner=False)
+def _open_qa_worksheet(spreadsheet_id: str, sheet_name: str, _client):
+    """Open the Q&A log worksheet once, creating it with a header row if it doesn't exist."""
+    spreadsheet = _client.open_by_key(spreadsheet_id)
+    worksheet = _get_worksheet(spreadsheet, sheet_name)
+    if worksheet is None:
+        worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=2)
+        worksheet.append_row(['question', 'answer'])
+    return worksheet
+
+
+def _read_sheet_logs(worksheet) -> List[Dict]:
+    """Read every logged row in one values request, keyed by the sheet's header row.
+    
+    Cells come back as strings, matching rows loaded from the CSV log.
+    """
+    values = worksheet.get_all_values()
+    if not values:
+        return []
+    header = values[0]
+    return [dict(zip(header, row)) for row in values[1:]]
+
+
+def _open_qa_csv(csv_log: Dict) -> None:
+    """(Re)open the CSV log for appending into csv_log, writing the header to a new file."""
+    fh = open(QA_LOG_FILE, 'a', buffering=1 << 16, newline='', encoding='utf-8')
+    writer = csv.writer(fh, lineterminator=os.linesep)
+    if fh.tell() == 0:
+        writer.writerow(LOG_COLS)
+        fh.flush()
+    csv_log['file'], csv_log['writer'] = fh, writer
+
+def _qa_csv_replaced(fh) -> bool:
+    """True if the open CSV log handle no longer refers to the file at QA_LOG_FILE."""
+    if fh.closed:
+        return True
+    try:
+        on_disk = os.stat(QA_LOG_FILE)
+    except FileNotFoundError:
+        return True
+    opened = os.fstat(fh.fileno())
+    return (on_disk.st_ino, on_disk.st_dev) != (opened.st_ino, opened.st_dev)
+
+@st.cache_resource(show_spinner=False)
+def _get_qa_csv_writer() -> Dict:
+    """Open the CSV log once for appending and share the handle ({'file', 'writer', 'lock'})."""
+    csv_log = {'lock': threading.Lock()}
+    _open_qa_csv(csv_log)
+    atexit.register(lambda: csv_log['file'].close())
+    return csv_log
+
+def _append_qa_csv(log_entry: Dict) -> None:
+    """Append one Q&A entry to the CSV log (Google Sheets fallback)."""
+    try:
+        csv_log = _get_qa_csv_writer()
+        with csv_log['lock']:
+            # A deleted or rotated log would otherwise swallow rows into the unlinked file
+            if _qa_csv_replaced(csv_log['file']):
+                csv_log['file'].close()
+                _open_qa_csv(csv_log)
+            csv_log['writer'].writerow([log_entry[col] for col in LOG_COLS])
+            # Flushed per row so the logs view (which reads the file) sees it right away
+            csv_log['file'].flush()
+        
+        logging.info(f"Successfully logged Q&A pair to {QA_LOG_FILE}")
+    except Exception as e:
+        logging.error(f"Error logging Q&A pair to file: {e}")
+        print(f"ERROR: Failed to log Q&A pair to file: {e}", file=sys.stderr)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_qa_buffer() -> Dict:
+    """Q&A rows waiting to be appended to Google Sheets, as (worksheet, log_entry).
+    
+    A cache_resource so the buffer survives script reruns and is shared by all sessions.
+    """
+    buffer = {'rows': [], 'lock': threading.Lock(), 'last_flush': 0.0, 'timer': None}
+    # Rows still buffered when the server stops would otherwise be lost
+    atexit.register(_flush_qa_buffer, buffer)
+    return buffer
+
+def _flush_qa_buffer(buffer: Optional[Dict] = None) -> Dict[int, bool]:
+    """Append buffered Q&A rows with one append_rows call per worksheet.
+    
+    Rows that can't be written fall back to the CSV log. Returns, keyed by id() of each
+    log entry this call sent, whether it reached Google Sheets (rows another flush
+    already took are not included).
+    """
+    if buffer is None:
+        buffer = _get_qa_buffer()
+    with buffer['lock']:
+        pending = buffer['rows'][:]
+        buffer['rows'].clear()
+        buffer['last_flush'] = time.monotonic()
+        if buffer['timer'] is not None:
+            buffer['timer'].cancel()
+            buffer['timer'] = None
+    
+    by_worksheet = {}
+    for worksheet, log_entry in pending:
+        by_worksheet.setdefault(id(worksheet), (worksheet, []))[1].append(log_entry)
+    
+    outcomes = {}
+    for worksheet, entries in by_worksheet.values():
+        try:
+            # Match your sheet: two columns "question", "answer"
+            worksheet.append_rows([[e['question'], e['answer']] for e in entries],
+                                  value_input_option='RAW', insert_data_option='INSERT_ROWS')
+            logging.info(f"Successfully logged {len(entries)} Q&A pair(s) to Google Sheets")
+            outcomes.update((id(e), True) for e in entries)
+        except Exception as e:
+            logging.warning(f"Error logging to Google Sheets: {e}")
+            for log_entry in entries:
+                _append_qa_csv(log_entry)
+                outcomes[id(log_entry)] = False
+    return outcomes
+
+
+def log_qa_pair(question: str, answer: str) -> str:
     """Log question and answer to Google Sheets (primary), CSV file (fallback), and session state.
-    Returns True if logged to Google Sheets, False otherwise."""
+    Returns 'sheets' if the row reached Google Sheets, 'queued' if it is buffered for
+    (or was taken by) another Sheets append, or 'csv' if it went to the CSV log.
+    
+    Sheets rows are buffered and sent together once QA_FLUSH_ROWS are waiting or
+    QA_FLUSH_SECONDS have passed; a timer flushes a partial batch the app goes idle on."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     log_entry = {
@@ -821,61 +1462,81 @@ def log_qa_pair(question: str, answer: str) -> bool:
     st.session_state.qa_logs.append(log_entry)
     
     # Try to log to Google Sheets first (permanent storage)
-    google_sheets_success = False
+    status = 'csv'
+    queued_for_sheets = False
     if GSPREAD_AVAILABLE:
         try:
-            client = get_google_sheets_client()
-            if client:
-                # Get spreadsheet ID from secrets or use default
-                spreadsheet_id = None
-                sheet_name = GOOGLE_SHEETS_SHEET_NAME
-                
-                try:
-                    if 'google_sheets' in st.secrets:
-                        spreadsheet_id = st.secrets['google_sheets'].get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID)
-                        sheet_name = st.secrets['google_sheets'].get('sheet_name', GOOGLE_SHEETS_SHEET_NAME)
-                    else:
-                        spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                except (AttributeError, KeyError):
-                    spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                
-                if spreadsheet_id:
-                    spreadsheet = client.open_by_key(spreadsheet_id)
-                    worksheet = _get_worksheet(spreadsheet, sheet_name)
-                    if worksheet is None:
-                        worksheet = spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=2)
-                        worksheet.append_row(['question', 'answer'])
-                    # Match your sheet: two columns "question", "answer"
-                    worksheet.append_row([question, answer])
-                    google_sheets_success = True
-                    logging.info("Successfully logged Q&A pair to Google Sheets")
+            spreadsheet_id, sheet_name = _resolve_sheet_ids()
+            
+            worksheet = get_qa_worksheet(spreadsheet_id, sheet_name) if spreadsheet_id else None
+            if worksheet:
+                # Rows go out in batches; a failed flush writes them to the CSV log instead
+                buffer = _get_qa_buffer()
+                with buffer['lock']:
+                    buffer['rows'].append((worksheet, log_entry))
+                    flush_due = (len(buffer['rows']) >= QA_FLUSH_ROWS or
+                                 time.monotonic() - buffer['last_flush'] > QA_FLUSH_SECONDS)
+                    if not flush_due and buffer['timer'] is None:
+                        # First row of a new batch: make sure it goes out even if no one logs again
+                        buffer['timer'] = threading.Timer(QA_FLUSH_SECONDS, _flush_qa_buffer, args=(buffer,))
+                        buffer['timer'].daemon = True
+                        buffer['timer'].start()
+                queued_for_sheets = True
+                if flush_due:
+                    # The timer may have flushed this row already; its outcome is not ours to report
+                    written = _flush_qa_buffer(buffer).get(id(log_entry))
+                    status = 'queued' if written is None else ('sheets' if written else 'csv')
+                else:
+                    status = 'queued'
         except Exception as e:
             logging.warning(f"Error logging to Google Sheets: {e}")
             # Continue to CSV fallback
     
-    # Fallback to CSV file if Google Sheets failed or not configured
-    if not google_sheets_success:
-        try:
-            file_exists = os.path.exists(QA_LOG_FILE)
-            df_new = pd.DataFrame([log_entry])
-            if file_exists:
-                df_new.to_csv(QA_LOG_FILE, mode='a', header=False, index=False, encoding='utf-8')
-            else:
-                df_new.to_csv(QA_LOG_FILE, mode='w', header=True, index=False, encoding='utf-8')
-            
-            logging.info(f"Successfully logged Q&A pair to {QA_LOG_FILE}")
-        except Exception as e:
-            logging.error(f"Error logging Q&A pair to file: {e}")
-            import sys
-            print(f"ERROR: Failed to log Q&A pair to file: {e}", file=sys.stderr)
+    # Fallback to CSV file if Google Sheets not configured
+    if not queued_for_sheets:
+        _append_qa_csv(log_entry)
     
-    return google_sheets_success
+    return status
+
+def _get_logs_display(qa_logs: List[Dict]) -> Tuple["pd.DataFrame", bytes, str]:
+    """Return the log table, its CSV download and a download timestamp.
+    
+    All three are rebuilt only when the session's log list changes, so the download
+    buttons keep the same file name (and widget identity) across reruns.
+    """
+    import pandas as pd
+    cached = st.session_state.get('qa_logs_display')
+    if cached is None or cached[0] is not qa_logs or cached[1] != len(qa_logs):
+        # Fixed schema: no per-row column discovery; rows loaded from Sheets have no timestamp
+        df_logs = pd.DataFrame.from_records(qa_logs, columns=LOG_COLS).fillna('')
+        cached = (qa_logs, len(qa_logs), df_logs, df_logs.to_csv(index=False).encode('utf-8'),
+                  datetime.now().strftime('%Y%m%d_%H%M%S'))
+        st.session_state.qa_logs_display = cached
+    return cached[2], cached[3], cached[4]
 
-def query_website_content(query: str, articles: List[Dict], client: OpenAI) -> Dict:
+def _answer_cache_key(prompt: str) -> Optional[Tuple[str, int]]:
+    """Key for reusing an answer in this session: normalized question + articles_version (None if too long)."""
+    normalized = ' '.join(prompt.lower().split())
+    if len(normalized) > ANSWER_CACHE_MAX_PROMPT:
+        return None
+    return normalized, st.session_state.get('articles_version', 0)
+
+def _remember_answer(key: Tuple[str, int], answer: str, sources: List[Dict]) -> None:
+    """Store an answer in the session's answer cache, dropping the oldest entry when full."""
+    cache = st.session_state.setdefault('answer_cache', {})
+    cache.pop(key, None)
+    if len(cache) >= ANSWER_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = (answer, sources)
+
+def query_website_content(query: str, articles: List[Dict], client: "OpenAI", placeholder=None) -> Dict:
     """Use LLM to answer questions about website content using semantic search.
     
+    If a Streamlit placeholder (st.empty()) is given, the answer is streamed into it as it arrives.
+    
     Returns:
-        Dict with 'answer' (str) and 'sources' (List[Dict]) - list of article dicts used as sources
+        Dict with 'answer' (str), 'sources' (List[Dict]) - list of article dicts used as sources,
+        and 'log_status' (str) - see log_qa_pair
     """
     # Use semantic search to find most relevant articles
     with st.spinner("Finding relevant articles..."):
@@ -885,18 +1546,17 @@ def query_website_content(query: str, articles: List[Dict], client: OpenAI) -> D
     query_lower = query.lower()
     if 'case study' in query_lower or 'case studies' in query_lower or 'success story' in query_lower:
         # Boost case studies in the results
-        case_studies = [a for a in similar_articles if 'case-study' in a.get('type', '').lower() or 
-                        'case study' in a.get('title', '').lower() or
-                        '/case-studies/' in a.get('url', '').lower()]
-        other_articles = [a for a in similar_articles if a not in case_studies]
+        case_studies, other_articles = [], []
+        for a in similar_articles:
+            (case_studies if a['is_case_study'] else other_articles).append(a)
         prioritized = case_studies + other_articles
     else:
         prioritized = similar_articles
     
     # Use top 20 most relevant articles
     context_articles = prioritized[:20]
-    context = "\n\n".join([f"Title: {a['title']}\nURL: {a.get('url', '')}\nContent: {a.get('content', a.get('description', ''))[:500]}" 
-                           for a in context_articles])  # Increased to 500 chars since we have better relevance
+    context = "\n\n".join(f"Title: {a['title']}\nURL: {a.get('url', '')}\nContent: {a['context_snippet']}"
+                          for a in context_articles)
     
     prompt = f"""You are a helpful assistant that answers questions about ridewithvia.com based on the following content:
 
@@ -908,18 +1568,28 @@ Answer based only on the content provided above. Include specific URLs when ment
     
     try:
         response = client.chat.completions.create(
-            model="gpt-4",
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant for ridewithvia.com. Answer questions based only on the provided content. Include URLs when mentioning specific articles."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=600
+            max_tokens=600,
+            stream=placeholder is not None
         )
-        answer = response.choices[0].message.content
+        if placeholder is None:
+            answer = response.choices[0].message.content
+        else:
+            parts = []
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    placeholder.markdown("".join(parts) + "▌")
+            answer = "".join(parts)
+            placeholder.markdown(answer)
         
         # Log the Q&A pair
-        logged_to_sheets = log_qa_pair(query, answer)
+        log_status = log_qa_pair(query, answer)
         
         # Return top 5 most relevant articles as sources (these are the ones most likely used)
         sources = context_articles[:5]
@@ -927,22 +1597,195 @@ Answer based only on the content provided above. Include specific URLs when ment
         return {
             'answer': answer,
             'sources': sources,
-            'logged_to_sheets': logged_to_sheets
+            'log_status': log_status
         }
     except Exception as e:
         error_msg = f"Error: {str(e)}"
         # Log errors too
-        logged_to_sheets = log_qa_pair(query, error_msg)
+        log_status = log_qa_pair(query, error_msg)
         return {
             'answer': error_msg,
             'sources': [],
-            'logged_to_sheets': logged_to_sheets
+            'log_status': log_status
         }
 
 # ============================================================================
 # STREAMLIT APP
 # ============================================================================
 
+# Caption under each answer for the status returned by log_qa_pair
+LOG_STATUS_CAPTIONS = {
+    'sheets': "✅ Logged to Google Sheets",
+    'queued': "⏳ Queued for Google Sheets",
+    'csv': "✅ Logged to CSV",
+}
+
+def _render_article_card(article: Dict, index: Optional[int] = None) -> None:
+    """Render one article as thumbnail + title, short description and link (numbered if index is given)."""
+    thumb_col, text_col = st.columns([1, 3])
+    with thumb_col:
+        if article.get('thumbnail'):
+            try:
+                st.image(article['thumbnail'], width=100)
+            except:
+                st.write("")  # Empty space if image fails to load
+        else:
+            st.write("")  # Empty space if no thumbnail
+    with text_col:
+        title = f"{index}. {article['title']}" if index is not None else article['title']
+        st.markdown(f"**{title}**")
+        if article.get('description'):
+            st.caption(article['desc_short'])
+        st.markdown(f"[Read more →]({article['url']})")
+
+@st.fragment
+def _render_logs_panel() -> None:
+    """Q&A log panel; reruns on its own when its widgets are used, without re-rendering the chat."""
+    st.markdown("---")
+    st.header("📊 Q&A Log")
+    
+    # Get logs from session state (primary source)
+    qa_logs = st.session_state.get('qa_logs', [])
+    
+    # One stat for every check on the CSV log below (None if it doesn't exist yet)
+    try:
+        log_file_size = os.stat(QA_LOG_FILE).st_size
+    except OSError:
+        log_file_size = None
+    
+    if qa_logs:
+        # DataFrame and CSV bytes are reused until a Q&A pair is logged or the logs are reloaded
+        df_logs, csv, download_ts = _get_logs_display(qa_logs)
+        
+        # Show stats
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Q&A Pairs", len(df_logs))
+        with col2:
+            latest = df_logs['timestamp'].max()
+            st.metric("Latest Entry", latest[:10] if latest else "N/A")
+        with col3:
+            # Check storage status
+            storage_status = "⚠️ Unknown"
+            storage_source = "Unknown"
+            if GSPREAD_AVAILABLE:
+                try:
+                    client = get_google_sheets_client()
+                    if client:
+                        storage_status = "✅ Google Sheets"
+                        storage_source = "Google Sheets"
+                    else:
+                        storage_status = "⚠️ CSV Only"
+                        storage_source = "CSV"
+                except:
+                    storage_status = "⚠️ CSV Only"
+                    storage_source = "CSV"
+            else:
+                storage_status = "⚠️ CSV Only"
+                storage_source = "CSV"
+            st.metric("Storage", storage_status)
+        with col4:
+            # Show link to Google Sheet if available
+            if storage_source == "Google Sheets":
+                try:
+                    spreadsheet_id = _resolve_sheet_ids()[0]
+                    
+                    if spreadsheet_id:
+                        sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
+                        st.markdown(f"[📊 View in Sheets]({sheet_url})")
+                except:
+                    pass
+        
+        st.markdown("")
+        
+        # Display logs
+        st.dataframe(df_logs, width='stretch', hide_index=True, use_container_width=True)
+        
+        st.markdown("")
+        
+        # Download buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            # Download from session state (most up-to-date)
+            st.download_button(
+                label="📥 Download Current Logs (CSV)",
+                data=csv,
+                file_name=f"qa_log_{download_ts}.csv",
+                mime="text/csv",
+                help="Download all logs from current session"
+            )
+        with col2:
+            # Try to download from file if it exists
+            if log_file_size is not None:
+                try:
+                    with open(QA_LOG_FILE, 'rb') as f:
+                        file_data = f.read()
+                    st.download_button(
+                        label="📥 Download File Logs (CSV)",
+                        data=file_data,
+                        file_name=f"qa_log_file_{download_ts}.csv",
+                        mime="text/csv",
+                        help="Download logs from saved file"
+                    )
+                except Exception as e:
+                    st.caption(f"File read error: {e}")
+            else:
+                st.caption("File not yet created")
+        
+        # Storage info
+        st.markdown("---")
+        if storage_source == "Google Sheets":
+            try:
+                spreadsheet_id = _resolve_sheet_ids()[0]
+                
+                if spreadsheet_id:
+                    sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
+                    st.success(f"✅ Logs are permanently stored in Google Sheets")
+                    st.caption(f"📊 [Open Google Sheet]({sheet_url}) | Sheet ID: `{spreadsheet_id}`")
+            except:
+                st.info("💡 Logs are stored in Google Sheets (permanent storage)")
+        else:
+            if log_file_size is not None:
+                st.warning(f"⚠️ Logs are stored locally in CSV file (may not persist in Streamlit Cloud)")
+                st.caption(f"📄 File location: `{QA_LOG_PATH}` ({log_file_size} bytes)")
+                st.info("💡 **Tip:** Set up Google Sheets for permanent storage across sessions. See `GOOGLE_SHEETS_SETUP.md`")
+            else:
+                st.warning(f"⚠️ Logs are only in session memory. They will be lost when the session ends.")
+                st.caption(f"💡 **Important:** Set up Google Sheets for permanent storage. See `GOOGLE_SHEETS_SETUP.md`")
+        
+        # Refresh button to reload from Google Sheets
+        if storage_source == "Google Sheets":
+            if st.button("🔄 Refresh from Google Sheets"):
+                try:
+                    # Send any buffered rows first so the reload includes them
+                    _flush_qa_buffer()
+                    client = get_google_sheets_client()
+                    if client:
+                        spreadsheet_id, sheet_name = _resolve_sheet_ids()
+                        
+                        if spreadsheet_id:
+                            worksheet = get_qa_worksheet(spreadsheet_id, sheet_name)
+                            if worksheet:
+                                records = _read_sheet_logs(worksheet)
+                                st.session_state.qa_logs = records
+                                st.success(f"✅ Refreshed! Loaded {len(records)} Q&A pairs from Google Sheets")
+                                st.rerun()
+                            else:
+                                st.error("Could not open worksheet. Check sheet name or use first tab with headers 'question', 'answer'.")
+                except Exception as e:
+                    st.error(f"Error refreshing from Google Sheets: {e}")
+        
+    else:
+        st.info("No Q&A pairs logged yet. Ask some questions to start logging!")
+        if log_file_size is not None:
+            st.caption(f"Note: Log file exists at `{QA_LOG_PATH}` but is empty or couldn't be loaded.")
+    
+    st.markdown("")
+    if st.button("Close Logs"):
+        st.session_state.show_logs = False
+        st.rerun()
+    st.markdown("---")
+
 def main():
     st.set_page_config(
         page_title="Via - Personalized Content",
@@ -969,23 +1812,12 @@ def main():
             try:
                 client = get_google_sheets_client()
                 if client:
-                    spreadsheet_id = None
-                    sheet_name = GOOGLE_SHEETS_SHEET_NAME
-                    
-                    try:
-                        if 'google_sheets' in st.secrets:
-                            spreadsheet_id = st.secrets['google_sheets'].get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID)
-                            sheet_name = st.secrets['google_sheets'].get('sheet_name', GOOGLE_SHEETS_SHEET_NAME)
-                        else:
-                            spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                    except (AttributeError, KeyError):
-                        spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
+                    spreadsheet_id, sheet_name = _resolve_sheet_ids()
                     
                     if spreadsheet_id:
-                        spreadsheet = client.open_by_key(spreadsheet_id)
-                        worksheet = _get_worksheet(spreadsheet, sheet_name)
+                        worksheet = get_qa_worksheet(spreadsheet_id, sheet_name)
                         if worksheet:
-                            records = worksheet.get_all_records()
+                            records = _read_sheet_logs(worksheet)
                             if records:
                                 st.session_state.qa_logs = records
                                 loaded_from_sheets = True
@@ -996,7 +1828,10 @@ def main():
         # Fallback to CSV file if Google Sheets didn't work
         if not loaded_from_sheets and os.path.exists(QA_LOG_FILE):
             try:
-                df_existing = pd.read_csv(QA_LOG_FILE)
+                import pandas as pd
+                # Text columns only; keep empty answers as '' rather than NaN
+                df_existing = pd.read_csv(QA_LOG_FILE, engine='c', dtype=str, keep_default_na=False,
+                                          usecols=LOG_COLS)
                 st.session_state.qa_logs = df_existing.to_dict('records')
                 logging.info(f"Loaded {len(st.session_state.qa_logs)} Q&A pairs from CSV file")
             except Exception as e:
@@ -1044,7 +1879,9 @@ def main():
         # Load articles (always use cache if available)
         if not st.session_state.articles:
             try:
-                st.session_state.articles = scrape_website_content(force_refresh=False)
+                force_refresh = st.session_state.pop('force_refresh', False)
+                st.session_state.articles = scrape_website_content(force_refresh=force_refresh)
+                st.session_state.articles_version = articles_version(st.session_state.articles)
             except Exception as e:
                 st.error(f"Error loading articles: {e}")
                 st.session_state.articles = []
@@ -1067,8 +1904,8 @@ def main():
                 st.rerun()
         with col3:
             if st.button("🔄 Refresh Cache"):
-                if os.path.exists(CONTENT_CACHE_FILE):
-                    os.remove(CONTENT_CACHE_FILE)
+                # Re-scrape on the next run; the old cache stays on disk for conditional GETs
+                st.session_state.force_refresh = True
                 st.session_state.articles = []
                 st.rerun()
         with col4:
@@ -1103,170 +1940,7 @@ def main():
         
         # Show logs if requested
         if st.session_state.show_logs:
-            st.markdown("---")
-            st.header("📊 Q&A Log")
-            
-            # Get logs from session state (primary source)
-            qa_logs = st.session_state.get('qa_logs', [])
-            
-            if qa_logs:
-                # Convert to DataFrame for display
-                df_logs = pd.DataFrame(qa_logs)
-                
-                # Show stats
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Total Q&A Pairs", len(df_logs))
-                with col2:
-                    if 'timestamp' in df_logs.columns:
-                        latest = df_logs['timestamp'].max() if len(df_logs) > 0 else "N/A"
-                        st.metric("Latest Entry", latest[:10] if latest != "N/A" else "N/A")
-                with col3:
-                    # Check storage status
-                    storage_status = "⚠️ Unknown"
-                    storage_source = "Unknown"
-                    if GSPREAD_AVAILABLE:
-                        try:
-                            client = get_google_sheets_client()
-                            if client:
-                                storage_status = "✅ Google Sheets"
-                                storage_source = "Google Sheets"
-                            else:
-                                storage_status = "⚠️ CSV Only"
-                                storage_source = "CSV"
-                        except:
-                            storage_status = "⚠️ CSV Only"
-                            storage_source = "CSV"
-                    else:
-                        storage_status = "⚠️ CSV Only"
-                        storage_source = "CSV"
-                    st.metric("Storage", storage_status)
-                with col4:
-                    # Show link to Google Sheet if available
-                    if storage_source == "Google Sheets":
-                        try:
-                            spreadsheet_id = None
-                            try:
-                                if 'google_sheets' in st.secrets:
-                                    spreadsheet_id = st.secrets['google_sheets'].get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID)
-                                else:
-                                    spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                            except (AttributeError, KeyError):
-                                spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                            
-                            if spreadsheet_id:
-                                sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
-                                st.markdown(f"[📊 View in Sheets]({sheet_url})")
-                        except:
-                            pass
-                
-                st.markdown("")
-                
-                # Display logs
-                st.dataframe(df_logs, width='stretch', hide_index=True, use_container_width=True)
-                
-                st.markdown("")
-                
-                # Download buttons
-                col1, col2 = st.columns(2)
-                with col1:
-                    # Download from session state (most up-to-date)
-                    csv = df_logs.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Download Current Logs (CSV)",
-                        data=csv,
-                        file_name=f"qa_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv",
-                        help="Download all logs from current session"
-                    )
-                with col2:
-                    # Try to download from file if it exists
-                    if os.path.exists(QA_LOG_FILE):
-                        try:
-                            with open(QA_LOG_FILE, 'rb') as f:
-                                file_data = f.read()
-                            st.download_button(
-                                label="📥 Download File Logs (CSV)",
-                                data=file_data,
-                                file_name=f"qa_log_file_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                mime="text/csv",
-                                help="Download logs from saved file"
-                            )
-                        except Exception as e:
-                            st.caption(f"File read error: {e}")
-                    else:
-                        st.caption("File not yet created")
-                
-                # Storage info
-                st.markdown("---")
-                if storage_source == "Google Sheets":
-                    try:
-                        spreadsheet_id = None
-                        try:
-                            if 'google_sheets' in st.secrets:
-                                spreadsheet_id = st.secrets['google_sheets'].get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID)
-                            else:
-                                spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                        except (AttributeError, KeyError):
-                            spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                        
-                        if spreadsheet_id:
-                            sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
-                            st.success(f"✅ Logs are permanently stored in Google Sheets")
-                            st.caption(f"📊 [Open Google Sheet]({sheet_url}) | Sheet ID: `{spreadsheet_id}`")
-                    except:
-                        st.info("💡 Logs are stored in Google Sheets (permanent storage)")
-                else:
-                    if os.path.exists(QA_LOG_FILE):
-                        full_path = os.path.abspath(QA_LOG_FILE)
-                        file_size = os.path.getsize(QA_LOG_FILE)
-                        st.warning(f"⚠️ Logs are stored locally in CSV file (may not persist in Streamlit Cloud)")
-                        st.caption(f"📄 File location: `{full_path}` ({file_size} bytes)")
-                        st.info("💡 **Tip:** Set up Google Sheets for permanent storage across sessions. See `GOOGLE_SHEETS_SETUP.md`")
-                    else:
-                        st.warning(f"⚠️ Logs are only in session memory. They will be lost when the session ends.")
-                        st.caption(f"💡 **Important:** Set up Google Sheets for permanent storage. See `GOOGLE_SHEETS_SETUP.md`")
-                
-                # Refresh button to reload from Google Sheets
-                if storage_source == "Google Sheets":
-                    if st.button("🔄 Refresh from Google Sheets"):
-                        try:
-                            client = get_google_sheets_client()
-                            if client:
-                                spreadsheet_id = None
-                                sheet_name = GOOGLE_SHEETS_SHEET_NAME
-                                try:
-                                    if 'google_sheets' in st.secrets:
-                                        spreadsheet_id = st.secrets['google_sheets'].get('spreadsheet_id', GOOGLE_SHEETS_SPREADSHEET_ID)
-                                        sheet_name = st.secrets['google_sheets'].get('sheet_name', GOOGLE_SHEETS_SHEET_NAME)
-                                    else:
-                                        spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                                except (AttributeError, KeyError):
-                                    spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
-                                
-                                if spreadsheet_id:
-                                    spreadsheet = client.open_by_key(spreadsheet_id)
-                                    worksheet = _get_worksheet(spreadsheet, sheet_name)
-                                    if worksheet:
-                                        records = worksheet.get_all_records()
-                                        st.session_state.qa_logs = records
-                                        st.success(f"✅ Refreshed! Loaded {len(records)} Q&A pairs from Google Sheets")
-                                        st.rerun()
-                                    else:
-                                        st.error("Could not open worksheet. Check sheet name or use first tab with headers 'question', 'answer'.")
-                        except Exception as e:
-                            st.error(f"Error refreshing from Google Sheets: {e}")
-                
-            else:
-                st.info("No Q&A pairs logged yet. Ask some questions to start logging!")
-                if os.path.exists(QA_LOG_FILE):
-                    st.caption(f"Note: Log file exists at `{os.path.abspath(QA_LOG_FILE)}` but is empty or couldn't be loaded.")
-            
-            st.markdown("")
-            if st.button("Close Logs"):
-                st.session_state.show_logs = False
-                st.rerun()
-            st.markdown("---")
+            _render_logs_panel()
         
         # Two columns: Chat and Recommendations
         col1, col2 = st.columns([2, 1])
@@ -1284,20 +1958,7 @@ def main():
                         st.markdown("---")
                         st.markdown("**Sources:**")
                         for article in message["sources"]:
-                            thumb_col, text_col = st.columns([1, 3])
-                            with thumb_col:
-                                if article.get('thumbnail'):
-                                    try:
-                                        st.image(article['thumbnail'], width=100)
-                                    except:
-                                        st.write("")  # Empty space if image fails to load
-                                else:
-                                    st.write("")  # Empty space if no thumbnail
-                            with text_col:
-                                st.markdown(f"**{article['title']}**")
-                                if article.get('description'):
-                                    st.caption(article['description'][:150] + "...")
-                                st.markdown(f"[Read more →]({article['url']})")
+                            _render_article_card(article)
             
             # Chat input
             if prompt := st.chat_input("Ask a question about Via..."):
@@ -1308,40 +1969,38 @@ def main():
                 
                 # Get response
                 with st.chat_message("assistant"):
+                    answer_placeholder = st.empty()
                     with st.spinner("Thinking..."):
                         try:
-                            if st.session_state.articles:
-                                result = query_website_content(prompt, st.session_state.articles, client)
+                            cache_key = _answer_cache_key(prompt)
+                            cached_answer = st.session_state.get('answer_cache', {}).get(cache_key) if cache_key else None
+                            if st.session_state.articles and cached_answer:
+                                # Same question already answered against these articles; still log the turn
+                                response_text, sources = cached_answer
+                                log_status = log_qa_pair(prompt, response_text)
+                            elif st.session_state.articles:
+                                result = query_website_content(prompt, st.session_state.articles, client,
+                                                               placeholder=answer_placeholder)
                                 # query_website_content already logs the Q&A pair
                                 response_text = result.get('answer', '')
                                 sources = result.get('sources', [])
-                                logged_to_sheets = result.get('logged_to_sheets', False)
+                                log_status = result.get('log_status', 'csv')
+                                # Errors come back without sources and aren't worth repeating
+                                if cache_key and sources:
+                                    _remember_answer(cache_key, response_text, sources)
                             else:
                                 response_text = "I'm sorry, but I don't have access to the website content right now. Please refresh the cache or try again later."
                                 sources = []
-                                logged_to_sheets = log_qa_pair(prompt, response_text)
+                                log_status = log_qa_pair(prompt, response_text)
                             
-                            st.markdown(response_text)
+                            answer_placeholder.markdown(response_text)
                             
                             # Display sources if available
                             if sources:
                                 st.markdown("---")
                                 st.markdown("**Sources:**")
                                 for article in sources:
-                                    thumb_col, text_col = st.columns([1, 3])
-                                    with thumb_col:
-                                        if article.get('thumbnail'):
-                                            try:
-                                                st.image(article['thumbnail'], width=100)
-                                            except:
-                                                st.write("")  # Empty space if image fails to load
-                                        else:
-                                            st.write("")  # Empty space if no thumbnail
-                                    with text_col:
-                                        st.markdown(f"**{article['title']}**")
-                                        if article.get('description'):
-                                            st.caption(article['description'][:150] + "...")
-                                        st.markdown(f"[Read more →]({article['url']})")
+                                    _render_article_card(article)
                             
                             # Store in chat history with sources
                             st.session_state.chat_history.append({
@@ -1352,10 +2011,7 @@ def main():
                             
                             # Show confirmation: where it was logged
                             log_count = len(st.session_state.get('qa_logs', []))
-                            if logged_to_sheets:
-                                st.caption(f"✅ Logged to Google Sheets (Total: {log_count} Q&A pairs)")
-                            else:
-                                st.caption(f"✅ Logged to CSV (Total: {log_count} Q&A pairs)")
+                            st.caption(f"{LOG_STATUS_CAPTIONS[log_status]} (Total: {log_count} Q&A pairs)")
                         except Exception as e:
                             error_msg = f"Error: {str(e)}"
                             st.error(error_msg)
@@ -1364,11 +2020,7 @@ def main():
                                 "content": error_msg,
                                 "sources": []
                             })
-                            logged_to_sheets = log_qa_pair(prompt, error_msg)
-                            if logged_to_sheets:
-                                st.caption("✅ Logged to Google Sheets")
-                            else:
-                                st.caption("✅ Logged to CSV")
+                            st.caption(LOG_STATUS_CAPTIONS[log_qa_pair(prompt, error_msg)])
         
         with col2:
             st.header("📚 Recommended Articles")
@@ -1377,10 +2029,11 @@ def main():
             # Get recommendations
             if st.session_state.articles:
                 try:
-                    recommended = recommend_articles(
-                        st.session_state.articles,
+                    recommended = _cached_recommendations(
                         user_profile['type'],
                         user_profile['state'],
+                        st.session_state.get('articles_version', 0),
+                        st.session_state.articles,
                         client
                     )
                     
@@ -1388,20 +2041,7 @@ def main():
                     if recommended.get('general'):
                         st.markdown("### General Content")
                         for i, article in enumerate(recommended['general'], 1):
-                            col1, col2 = st.columns([1, 3])
-                            with col1:
-                                if article.get('thumbnail'):
-                                    try:
-                                        st.image(article['thumbnail'], width=100)
-                                    except:
-                                        st.write("")  # Empty space if image fails to load
-                                else:
-                                    st.write("")  # Empty space if no thumbnail
-                            with col2:
-                                st.markdown(f"**{i}. {article['title']}**")
-                                if article.get('description'):
-                                    st.caption(article['description'][:150] + "...")
-                                st.markdown(f"[Read more →]({article['url']})")
+                            _render_article_card(article, i)
                             if i < len(recommended['general']):  # Don't add divider after last item
                                 st.divider()
                     
@@ -1411,20 +2051,7 @@ def main():
                     st.markdown("### Case Studies & Success Stories")
                     if recommended.get('case_studies'):
                         for i, article in enumerate(recommended['case_studies'], 1):
-                            col1, col2 = st.columns([1, 3])
-                            with col1:
-                                if article.get('thumbnail'):
-                                    try:
-                                        st.image(article['thumbnail'], width=100)
-                                    except:
-                                        st.write("")  # Empty space if image fails to load
-                                else:
-                                    st.write("")  # Empty space if no thumbnail
-                            with col2:
-                                st.markdown(f"**{i}. {article['title']}**")
-                                if article.get('description'):
-                                    st.caption(article['description'][:150] + "...")
-                                st.markdown(f"[Read more →]({article['url']})")
+                            _render_article_card(article, i)
                             if i < len(recommended['case_studies']):  # Don't add divider after last item
                                 st.divider()
                     else: